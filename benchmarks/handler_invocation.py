@@ -0,0 +1,71 @@
+"""Measures the per-call overhead wrap_handler adds around a handler: argument parsing, calling it and wrapping its
+return value in a Response. The handlers themselves do no work, so the numbers are all socketwrench.
+
+The numbers depend on the machine, so compare cases with each other rather than with figures measured elsewhere.
+"query-only (generic)" is the query-only handler with a **kwargs added, which makes it take the generic parser every
+other handler with plain parameters used to take; the ratio between the two query-only lines is what the specialised
+parser saves.
+
+Run from the repository root:
+    python benchmarks/handler_invocation.py
+"""
+import sys
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from socketwrench.handlers import wrap_handler
+from socketwrench.types import Request, Body, Headers, Method, Route, Query
+
+CLIENT_ADDRESS = ("127.0.0.1", 54321)
+N = 20_000
+
+
+def request(target: str = "/x", body: bytes = b"", content_type: str = None) -> Request:
+    head = f"POST {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}"
+    if content_type:
+        head += f"\r\nContent-Type: {content_type}"
+    return Request.from_components(head.encode(), body, CLIENT_ADDRESS)
+
+
+def zero_args():
+    return "ok"
+
+
+def query_only(a: int, b: str = "x"):
+    return "ok"
+
+
+def query_generic(a: int, b: str = "x", **kwargs):
+    return "ok"
+
+
+def body_only(body: Body):
+    return "ok"
+
+
+def autofill_heavy(request: Request, headers: Headers, method: Method, route: Route, query: Query, body: Body):
+    return "ok"
+
+
+CASES = {
+    "zero-arg": (zero_args, lambda: request("/x?a=1")),
+    "query-only": (query_only, lambda: request("/x?a=1&b=two")),
+    "query-only (generic)": (query_generic, lambda: request("/x?a=1&b=two")),
+    "body-only": (body_only, lambda: request("/x", b"\x00\x01binary upload" * 8, "application/octet-stream")),
+    "autofill-heavy": (autofill_heavy, lambda: request("/x", b"plain text body", "text/plain")),
+}
+
+
+def per_call(handler, make_request) -> float:
+    """Best of 5 runs, in microseconds per call."""
+    wrapped = wrap_handler(handler)
+    r = make_request()
+    wrapped(r)  # warm up
+    return min(repeat(lambda: wrapped(r), number=N, repeat=5)) / N * 1e6
+
+
+if __name__ == "__main__":
+    for name, (handler, make_request) in CASES.items():
+        print(f"{name + ':':24s}{per_call(handler, make_request):8.2f} us/call")
@@ -0,0 +1,44 @@
+"""Measures how long a handler returning a large JSON list (a few MB) takes to turn into a Response, for each
+available JSON codec, with and without a return annotation.
+
+Run from the repository root:
+    python benchmarks/json_encoding.py
+"""
+import sys
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from socketwrench import json_codec
+from socketwrench.handlers import wrap_handler
+from socketwrench.types import Request
+
+ROWS = [{"id": i, "name": f"item {i}", "price": i * 0.25, "tags": ["a", "b"], "active": i % 2 == 0}
+        for i in range(40_000)]
+REQUEST = Request.from_components(b"GET /items HTTP/1.1\r\nHost: localhost", b"", ("127.0.0.1", 54321))
+
+
+def annotated() -> list:
+    return ROWS
+
+
+def unannotated():
+    return ROWS
+
+
+def per_call(handler) -> tuple:
+    """(best of 5, in milliseconds per call, body size in bytes)"""
+    wrapped = wrap_handler(handler)
+    size = len(wrapped(REQUEST).body)
+    return min(repeat(lambda: wrapped(REQUEST), number=5, repeat=5)) / 5 * 1e3, size
+
+
+if __name__ == "__main__":
+    for codec in (json_codec.json_codec, json_codec.orjson_codec):
+        if codec is None:
+            continue
+        json_codec.set_json_codec(codec)
+        for handler in (annotated, unannotated):
+            ms, size = per_call(handler)
+            print(f"{codec.name:7s} {handler.__name__:12s} {ms:8.2f} ms/call  {size / 1e6:.2f} MB")
@@ -0,0 +1,76 @@
+"""Measures how much memory parsing a request and building its response allocates, using tracemalloc.
+
+Run from the repository root:
+    python benchmarks/request_allocations.py
+"""
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from socketwrench.types import Request, Response
+
+PRE_BODY_BYTES = (
+    b"GET /api/items?page=2&size=10 HTTP/1.1\r\n"
+    b"Host: localhost:8080\r\n"
+    b"User-Agent: bench/1.0\r\n"
+    b"Accept: application/json\r\n"
+    b"Accept-Encoding: gzip, deflate\r\n"
+    b"Connection: keep-alive"
+)
+CLIENT_ADDRESS = ("127.0.0.1", 54321)
+N = 10_000
+
+
+def parse() -> Request:
+    return Request.from_components(PRE_BODY_BYTES, b"", CLIENT_ADDRESS)
+
+
+def cycle() -> bytes:
+    request = parse()
+    response = Response(b'{"ok": true}', headers={"Content-Type": "application/json"})
+    return response.pre_body_bytes() + response.body
+
+
+def retained_per_request() -> float:
+    """Bytes held by each parsed Request while it is alive."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    requests = [parse() for _ in range(N)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del requests
+    return (after - before) / N
+
+
+def peak_per_cycle() -> int:
+    """Peak bytes allocated while parsing one request and serializing one small response."""
+    cycle()  # warm up any caches
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    cycle()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - base
+
+
+def allocations_per_cycle() -> tuple:
+    """(blocks, bytes) still allocated per parsed Request plus built Response, while both are kept alive."""
+    tracemalloc.start()
+    snapshot1 = tracemalloc.take_snapshot()
+    kept = [(parse(), Response(b'{"ok": true}', headers={"Content-Type": "application/json"})) for _ in range(N)]
+    snapshot2 = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = snapshot2.compare_to(snapshot1, "filename")
+    del kept
+    return sum(s.count_diff for s in stats) / N, sum(s.size_diff for s in stats) / N
+
+
+if __name__ == "__main__":
+    print(f"retained bytes per Request:             {retained_per_request():8.1f}")
+    blocks, size = allocations_per_cycle()
+    print(f"retained blocks per Request + Response: {blocks:8.1f}")
+    print(f"retained bytes per Request + Response:  {size:8.1f}")
+    print(f"peak bytes per request/response cycle:  {peak_per_cycle():8d}")
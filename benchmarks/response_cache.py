@@ -0,0 +1,39 @@
+"""Measures how long RouteHandler takes to answer a GET for a JSON endpoint with and without `@cached`, so the hit path
+(no argument parsing, handler call or serialization) can be compared with a full call, and for the same data returned by
+a `@constant` route.
+
+Run from the repository root:
+    python benchmarks/response_cache.py
+"""
+import sys
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from socketwrench.handlers import RouteHandler
+from socketwrench.tags import cached, constant
+from socketwrench.types import Request
+
+N = 5_000
+ROWS = [{"id": i, "name": f"item {i}", "price": i * 0.25} for i in range(200)]
+
+
+def report(page: int = 1, per_page: int = 50) -> list:
+    return ROWS[(page - 1) * per_page:page * per_page]
+
+
+def request(target: str) -> Request:
+    return Request.from_components(f"GET {target} HTTP/1.1\r\nHost: localhost".encode(), b"", ("127.0.0.1", 54321))
+
+
+if __name__ == "__main__":
+    routes = RouteHandler()
+    routes.route(report, "/uncached")
+    routes.route(cached(ttl=60)(lambda page=1, per_page=50: report(page, per_page)), "/cached")
+    routes.route(constant(lambda: report(2, 50)), "/constant")
+    for target in ("/uncached?page=2&per_page=50", "/cached?page=2&per_page=50", "/constant"):
+        r = request(target)
+        routes(r)  # warm up (and fill the cache)
+        t = min(repeat(lambda: routes(r), number=N, repeat=5)) / N * 1e6
+        print(f"{target.split('?')[0] + ':':12s}{t:8.2f} us/request")
@@ -0,0 +1,50 @@
+"""Measures how long RouteHandler takes to find the handler for a request when it has to go through variadic routes,
+with the matching route near the end of the candidates, one rejected by a tag constraint, and no match at all.
+
+Run from the repository root:
+    python benchmarks/route_matching.py
+"""
+import sys
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from socketwrench.handlers import RouteHandler
+from socketwrench.tags import tag
+from socketwrench.types import Request
+
+N = 2_000
+
+
+def handler():
+    return "ok"
+
+
+def make_routes() -> RouteHandler:
+    routes = RouteHandler()
+    for i in range(50):
+        routes.route(handler, f"/api/v{i}/{{name}}/details")
+    routes.route(tag(lambda kind: "ok", kind=["a", "b", "c"]), "/files/{kind}/list")
+    routes.route(lambda stem, ext: "ok", "/files/{stem}.{ext}")
+    return routes
+
+
+def request(target: str) -> Request:
+    return Request.from_components(f"GET {target} HTTP/1.1\r\nHost: localhost".encode(), b"", ("127.0.0.1", 54321))
+
+
+CASES = {
+    "last-candidate": "/files/report.json",
+    "tag-constraint": "/files/b/list",
+    "no-match": "/nothing/here/at/all",
+}
+
+
+if __name__ == "__main__":
+    routes = make_routes()
+    for name, target in CASES.items():
+        r = request(target)
+        routes(r)  # warm up
+        t = min(repeat(lambda: routes(r), number=N, repeat=5)) / N * 1e6
+        print(f"{name + ':':16s}{t:8.2f} us/request")
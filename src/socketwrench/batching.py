@@ -0,0 +1,151 @@
+from socketwrench.standardlib_dependencies import Event, Lock, threading_available
+
+
+class _Batch:
+    __slots__ = ("items", "full", "done", "results", "error", "traceback")
+
+    def __init__(self):
+        self.items = []
+        self.full = Event()
+        self.done = Event()
+        self.results = None
+        self.error = None
+        self.traceback = None
+
+
+class Batcher:
+    """Collects the calls made to `func` from concurrent requests and runs them as one call on a list of items.
+
+    The first request into an empty batch leads it: it waits until `max_size` items have joined or `max_wait_ms` has
+    passed, then calls `func(items)` on its own thread, which must return one result per item, in order. Every other
+    request just waits for its result. If `func` raises, every request in the batch gets the exception.
+    """
+    def __init__(self, func, max_size: int = 32, max_wait_ms: float = 5.0):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.func = func
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._pending = None
+        self._lock = Lock() if threading_available else None
+
+    def submit(self, item):
+        """Adds `item` to the current batch and returns its result once the batch has run."""
+        if self._lock is None:
+            # nothing else can be running at the same time, so the batch is always just this one
+            self.batches += 1
+            self.items += 1
+            return self._results([item])[0]
+
+        with self._lock:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch()
+            index = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_size:
+                self._close(batch)
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                self._close(batch)
+                self.batches += 1
+                self.items += len(batch.items)
+            try:
+                batch.results = self._results(batch.items)
+            except BaseException as e:
+                batch.error = e
+                batch.traceback = e.__traceback__
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            # every request raises the same exception, so start each from the batch's traceback rather than the last
+            # request's
+            raise batch.error.with_traceback(batch.traceback)
+        return batch.results[index]
+
+    def _close(self, batch: _Batch):
+        # nothing else joins a batch once it is full or its leader has stopped waiting
+        if self._pending is batch:
+            self._pending = None
+
+    def _results(self, items: list) -> list:
+        results = list(self.func(items))
+        if len(results) != len(items):
+            raise ValueError(f"A batched handler must return one result per item, got {len(results)} for "
+                             f"{len(items)}")
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "average_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "traceback")
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+        self.traceback = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time. Callers which ask for a key while its call is running wait for that call
+    and share its result (or its exception) instead of making their own.
+
+    Nothing is kept once a call has finished, so this is not a cache: the next caller for the key makes a new call.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}
+        self._lock = Lock() if threading_available else None
+
+    def do(self, key, func):
+        """Returns `func()`, or the result of the call for `key` already in flight."""
+        if self._lock is None:
+            self.calls += 1
+            return func()
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if leader:
+            try:
+                flight.result = func()
+            except BaseException as e:
+                flight.error = e
+                flight.traceback = e.__traceback__
+            finally:
+                # later callers start a new call rather than getting this result
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error.with_traceback(flight.traceback)
+        return flight.result
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._flights)}
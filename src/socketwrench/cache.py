@@ -0,0 +1,110 @@
+from socketwrench.standardlib_dependencies import Lock
+
+
+class LRUCache:
+    """A thread-safe least-recently-used cache bounded by the total size, in bytes, of what it holds.
+
+    Callers say how big each value is when they `set` it. The least recently used entries are evicted until the new one
+    fits, and a value bigger than the whole budget is never stored.
+    """
+    default_max_bytes: int = 8 * 1024 * 1024
+
+    def __init__(self, max_bytes: int = default_max_bytes, max_entries: int = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        # dicts keep insertion order, so the first key is always the least recently used
+        self._entries = {}
+        self._lock = Lock() if Lock is not None else None
+
+    def _acquire(self):
+        if self._lock is not None:
+            self._lock.acquire()
+
+    def _release(self):
+        if self._lock is not None:
+            self._lock.release()
+
+    def get(self, key, default=None):
+        self._acquire()
+        try:
+            try:
+                value, size = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = (value, size)
+            self.hits += 1
+            return value
+        finally:
+            self._release()
+
+    def set(self, key, value, size: int = 0) -> bool:
+        """Stores `value`, evicting old entries to make room. Returns False if it is too big to be cached at all."""
+        if size > self.max_bytes:
+            self.pop(key)
+            return False
+        self._acquire()
+        try:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            while self._entries and (self.bytes + size > self.max_bytes or
+                                     (self.max_entries is not None and len(self._entries) >= self.max_entries)):
+                _, evicted_size = self._entries.pop(next(iter(self._entries)))
+                self.bytes -= evicted_size
+                self.evictions += 1
+            self._entries[key] = (value, size)
+            self.bytes += size
+            return True
+        finally:
+            self._release()
+
+    def pop(self, key, default=None):
+        self._acquire()
+        try:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.bytes -= entry[1]
+            return entry[0]
+        finally:
+            self._release()
+
+    def clear(self) -> None:
+        self._acquire()
+        try:
+            self._entries.clear()
+            self.bytes = 0
+        finally:
+            self._release()
+
+    def keys(self) -> list:
+        """A snapshot of the keys, least recently used first."""
+        self._acquire()
+        try:
+            return list(self._entries)
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({len(self._entries)} entries, {self.bytes}/{self.max_bytes} bytes, hits={self.hits}, misses={self.misses})>"
@@ -0,0 +1,215 @@
+from socketwrench.standardlib_dependencies import zlib, zstd
+from socketwrench.types import Request, Response, StreamedResponse, FileSlice, Headers
+
+
+def available_encodings() -> list:
+    """The content codings this interpreter can produce, most preferred first."""
+    encodings = []
+    if zstd is not None:
+        encodings.append("zstd")
+    if zlib is not None:
+        encodings.extend(["gzip", "deflate"])
+    return encodings
+
+
+def compressor(encoding: str, level: int = None):
+    """A streaming compressor (with `compress(data)` and `flush()`) for a content coding."""
+    if encoding == "zstd":
+        return zstd.ZstdCompressor(level=level)
+    if encoding == "gzip":
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        # "deflate" in HTTP means the zlib format, not a raw deflate stream
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, zlib.MAX_WBITS)
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+
+def parse_accept_encoding(accept_encoding: str) -> dict:
+    """Parses an Accept-Encoding header into {coding: qvalue}, e.g. 'gzip, br;q=0.5' -> {'gzip': 1.0, 'br': 0.5}."""
+    preferences = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            k, _, v = param.partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        preferences[coding] = q
+    return preferences
+
+
+def choose_encoding(accept_encoding: str, offered) -> str:
+    """The coding out of `offered` the client prefers (ties go to the order of `offered`), or None if it accepts none
+    of them. Codings it doesn't name get the q-value of `*`, and q=0 refuses a coding."""
+    if not accept_encoding:
+        return None
+    preferences = parse_accept_encoding(accept_encoding)
+    wildcard = preferences.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in offered:
+        q = preferences.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressedStreamResponse(StreamedResponse):
+    """Compresses another StreamedResponse's parts as they are written. The length isn't known up front, so it is sent
+    with chunked transfer encoding. With `encoding` None the parts are passed on as they are and only the headers
+    differ from the source's."""
+
+    def __new__(cls, *args, **kwargs):
+        # Response.__new__ would hand back `source` itself, since it is already a Response
+        return super().__new__(cls)
+
+    def __init__(self, source: StreamedResponse, encoding: str, headers: Headers, level: int = None,
+                 chunk_size: int = 64 * 1024):
+        super().__init__(b"", status_code=source.status_code, headers=headers, version=source.version)
+        self.source = source
+        self.encoding = encoding
+        self.level = level
+        self.chunk_size = chunk_size
+
+    def parts(self):
+        if self.encoding is None:
+            yield from self.source.parts()
+            return
+        c = compressor(self.encoding, self.level)
+        for part in self.source.parts():
+            chunks = part.iter_chunks(self.chunk_size) if isinstance(part, FileSlice) else (part,)
+            for chunk in chunks:
+                out = c.compress(chunk)
+                if out:
+                    yield out
+        out = c.flush()
+        if out:
+            yield out
+
+
+class ResponseCompressor:
+    """The compression stage of response serialization: picks a content coding from the request's Accept-Encoding and
+    returns a compressed copy of the response. The original response is never modified, so it may be shared or cached.
+
+    Responses are left alone if they are smaller than `min_size`, their Content-Type doesn't start with one of
+    `content_types`, they already have a Content-Encoding, they are partial (206) or bodiless, or their route was tagged
+    `@no_compression`.
+    """
+    default_min_size: int = 1024
+    default_content_types: tuple = (
+        "text/",
+        "application/json",
+        "application/javascript",
+        "application/xml",
+        "application/xhtml+xml",
+        "application/manifest+json",
+        "application/wasm",
+        "image/svg+xml",
+    )
+
+    def __init__(self,
+                 min_size: int = default_min_size,
+                 level=None,
+                 content_types: tuple = default_content_types,
+                 encodings: list = None):
+        """
+        Args:
+            min_size (int, optional): Bodies smaller than this many bytes are sent as they are. Defaults to 1024.
+            level (int | dict[str, int], optional): Compression level, for every coding or per coding.
+                Defaults to each library's default (6 for gzip/deflate, 3 for zstd).
+            content_types (tuple[str], optional): Content-Type prefixes which are worth compressing.
+            encodings (list[str], optional): Codings to offer, most preferred first. Defaults to every available one
+                of "zstd" (python 3.14+), "gzip" and "deflate".
+        """
+        available = available_encodings()
+        self.encodings = [e for e in (encodings or available) if e in available]
+        self.min_size = min_size
+        self.level = level
+        self.content_types = tuple(content_types)
+
+    def level_for(self, encoding: str):
+        if isinstance(self.level, dict):
+            return self.level.get(encoding)
+        return self.level
+
+    def negotiate(self, accept_encoding: str):
+        """The offered coding the client prefers (ties go to our order), or None to send the response as is."""
+        return choose_encoding(accept_encoding, self.encodings)
+
+    def is_compressible(self, response: Response) -> bool:
+        if not getattr(response, "compressible", True):
+            return False
+        headers = response.headers
+        if headers is None or "Content-Encoding" in headers:
+            return False
+        status_code = response.status_code
+        if status_code < 200 or status_code in (204, 206, 304):
+            return False
+        content_type = str(headers.get("Content-Type", "")).lower()
+        if not content_type.startswith(self.content_types):
+            return False
+        if isinstance(response, StreamedResponse):
+            length = headers.get("Content-Length")
+            return length is None or int(length) >= self.min_size
+        return len(response.body) >= self.min_size
+
+    def compress(self, request: Request, response: Response) -> Response:
+        """Returns the response compressed for this request, or the response itself if it shouldn't be.
+
+        A response which could have been compressed always says `Vary: Accept-Encoding`, even when this client gets it
+        uncompressed, so shared caches don't hand that copy to clients which accept compression.
+        """
+        if not self.encodings or not self.is_compressible(response):
+            return response
+        encoding = self.negotiate(request.headers.get("Accept-Encoding", ""))
+        level = self.level_for(encoding) if encoding is not None else None
+        if encoding is None and self._varies(response.headers):
+            return response
+        # responses which are sent again and again (cached ones) keep their compressed copies
+        memo = getattr(response, "compressed", None)
+        if memo is not None:
+            compressed = memo.get((encoding, level))
+            if compressed is None:
+                compressed = memo[(encoding, level)] = self._compress(response, encoding, level)
+            return compressed
+        return self._compress(response, encoding, level)
+
+    @staticmethod
+    def _varies(headers) -> bool:
+        vary = str(headers.get("Vary", "")).lower()
+        return "accept-encoding" in vary or vary.strip() == "*"
+
+    def _compress(self, response: Response, encoding, level) -> Response:
+        """A copy of `response` compressed with `encoding`, or only given the Vary header if `encoding` is None."""
+        headers = Headers(dict(response.headers))
+        vary = headers.get("Vary")
+        if not vary:
+            headers["Vary"] = "Accept-Encoding"
+        elif not self._varies(headers):
+            headers["Vary"] = vary + ", Accept-Encoding"
+        if encoding is None:
+            if isinstance(response, StreamedResponse):
+                return CompressedStreamResponse(response, None, headers)
+            return Response(response.body, status_code=response.status_code, headers=headers, version=response.version)
+
+        identity_headers = Headers(dict(headers))
+        headers.pop("Content-Length", None)
+        headers["Content-Encoding"] = encoding
+        etag = headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            # the compressed bytes differ from the identity ones, so a strong validator would be wrong
+            headers["ETag"] = "W/" + etag
+
+        if isinstance(response, StreamedResponse):
+            return CompressedStreamResponse(response, encoding, headers, level=level)
+        c = compressor(encoding, level)
+        body = c.compress(response.body) + c.flush()
+        if len(body) >= len(response.body):
+            return Response(response.body, status_code=response.status_code, headers=identity_headers,
+                            version=response.version)
+        return Response(body, status_code=response.status_code, headers=headers, version=response.version)
@@ -1,15 +1,197 @@
 from socketwrench.standardlib_dependencies import (
     logging,
+    monotonic,
+    select,
+    sleep,
     socket,
+    Lock,
+    Thread,
 )
 
-from socketwrench.types import Request, Response, InternalServerError
+from socketwrench.types import Request, RequestBody, Response, RawResponse, InternalServerError, SSEResponse, \
+    WebSocketResponse, StreamedResponse, FileSlice
+from socketwrench.websockets import WebSocket
 
 logger = logging.getLogger("socketwrench")
 
 
+class EventStream:
+    """Pairs a client socket with an SSEResponse and writes whatever frames are ready each time it is stepped."""
+    def __init__(self, connection_socket: socket.socket, response: SSEResponse, cleanup_event=None):
+        self.socket = connection_socket
+        self.response = response
+        self.cleanup_event = cleanup_event
+        self.last_write = monotonic()
+        self.closed = False
+
+    def step(self, now: float) -> bool:
+        """Sends any ready frames, or a keep-alive comment if the stream has been quiet. Returns True if events were sent."""
+        if self.closed:
+            return False
+        if self.cleanup_event is not None and self.cleanup_event.is_set():
+            self.close()
+            return False
+        try:
+            frames = self.response.pull()
+            if frames is None:
+                self.close()
+                return False
+            if frames:
+                self.socket.sendall(b"".join(frames))
+                self.last_write = now
+                return True
+            if self.response.keep_alive and (now - self.last_write) >= self.response.keep_alive:
+                self.socket.sendall(SSEResponse.KEEP_ALIVE)
+                self.last_write = now
+        except OSError:
+            # client went away
+            self.close()
+        except Exception as e:
+            logger.error(f"Error in event stream: {e}")
+            self.close()
+        return False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.response.close()
+        try:
+            self.socket.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        self.socket.close()
+
+    @staticmethod
+    def drop_disconnected(streams: list) -> None:
+        """Closes streams whose client hung up. An SSE client never sends anything, so a readable socket means EOF."""
+        if select is None or not streams:
+            return
+        try:
+            readable, _, _ = select([s.socket for s in streams], [], [], 0)
+        except (OSError, ValueError):
+            return
+        for stream in streams:
+            if stream.socket in readable:
+                try:
+                    data = stream.socket.recv(1024)
+                except OSError:
+                    data = b""
+                if not data:
+                    stream.close()
+
+
+class EventStreamPump:
+    """Services every open SSE stream from one background thread, so subscribers don't each pin a worker thread.
+
+    The thread is started when the first stream is added and exits once no streams remain.
+    """
+    default_poll_interval = 0.05
+
+    def __init__(self, cleanup_event=None, poll_interval: float = default_poll_interval):
+        self.cleanup_event = cleanup_event
+        self.poll_interval = poll_interval
+        self.streams = []
+        self._lock = Lock()
+        self._thread = None
+
+    def add(self, stream: EventStream):
+        with self._lock:
+            self.streams.append(stream)
+            if self._thread is None:
+                self._thread = Thread(target=self.run, daemon=True)
+                self._thread.start()
+
+    def run(self):
+        while True:
+            with self._lock:
+                self.streams = [s for s in self.streams if not s.closed]
+                streams = list(self.streams)
+                if not streams:
+                    self._thread = None
+                    return
+            if self.cleanup_event is not None and self.cleanup_event.is_set():
+                for stream in streams:
+                    stream.close()
+                continue
+            EventStream.drop_disconnected(streams)
+            now = monotonic()
+            busy = False
+            for stream in streams:
+                if stream.step(now):
+                    busy = True
+            if not busy:
+                sleep(self.poll_interval)
+
+    def close(self):
+        with self._lock:
+            streams = list(self.streams)
+        for stream in streams:
+            stream.close()
+
+
+class BufferPool:
+    """A server-wide pool of fixed size bytearrays, reused by connections for receiving requests and writing responses.
+
+    Buffers are checked out when a connection needs one and checked back in when it closes. At most `max_buffers` idle
+    buffers are kept, anything returned beyond that (or any buffer which had to grow past `buffer_size`) is dropped.
+    """
+    default_buffer_size: int = 16 * 1024
+    default_max_buffers: int = 256
+
+    def __init__(self, buffer_size: int = default_buffer_size, max_buffers: int = default_max_buffers):
+        self.buffer_size = buffer_size
+        self.max_buffers = max_buffers
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self._free = []
+        self._lock = Lock() if Lock is not None else None
+
+    def checkout(self) -> bytearray:
+        """Returns an idle buffer if there is one (a hit), otherwise allocates a new one (a miss)."""
+        if self._lock is not None:
+            self._lock.acquire()
+        try:
+            if self._free:
+                self.hits += 1
+                return self._free.pop()
+            self.misses += 1
+        finally:
+            if self._lock is not None:
+                self._lock.release()
+        return bytearray(self.buffer_size)
+
+    def checkin(self, buffer: bytearray) -> None:
+        """Returns a buffer to the pool. The contents are left as they are, the next user overwrites them."""
+        if self._lock is not None:
+            self._lock.acquire()
+        try:
+            if len(buffer) == self.buffer_size and len(self._free) < self.max_buffers:
+                self._free.append(buffer)
+            else:
+                self.discarded += 1
+        finally:
+            if self._lock is not None:
+                self._lock.release()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "discarded": self.discarded,
+            "idle": len(self._free),
+            "max_buffers": self.max_buffers,
+            "buffer_size": self.buffer_size,
+        }
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}(buffer_size={self.buffer_size}, max_buffers={self.max_buffers}, hits={self.hits}, misses={self.misses})>"
+
+
 class Connection:
     default_chunk_size: int = 1024
+    default_keep_alive_timeout: float = 0
     timeout = 5
 
     def __init__(self,
@@ -18,28 +200,90 @@ class Connection:
                  client_address: tuple,
                  cleanup_event,
                  chunk_size: int = default_chunk_size,
-                 origin: str = ""):
+                 origin: str = "",
+                 event_stream_pump: EventStreamPump = None,
+                 keep_alive_timeout: float = default_keep_alive_timeout,
+                 executor=None,
+                 buffer_pool: BufferPool = None,
+                 compressor=None):
+        """A single client connection, which may carry several (pipelined) requests.
+
+        Args:
+            keep_alive_timeout (float, optional): How long to wait for another request once every request received so
+                far has been answered. With the default of 0 the connection is kept open only while the client already
+                has more requests on the wire, so a worker thread is never parked on an idle client.
+            executor (ThreadPoolExecutor, optional): If given, pipelined requests which arrived together are handled
+                concurrently on it. Responses are always written in the order the requests were received.
+            buffer_pool (BufferPool, optional): Where to check out the receive and response scratch buffers from (and
+                return them to on close). Without one the connection allocates its own.
+            compressor (ResponseCompressor, optional): If given, responses are compressed according to the request's
+                Accept-Encoding before they are written.
+        """
         self.socket = connection_socket
         self.client_addr = client_address
         self.chunk_size = chunk_size
         self.cleanup_event = cleanup_event
         self.handler = handler
         self.origin = origin
+        self.event_stream_pump = event_stream_pump
+        self.keep_alive_timeout = keep_alive_timeout
+        self.executor = executor
+        self.closed = False
+
+        self.buffer_pool = buffer_pool
+        self.compressor = compressor
 
+        # received bytes live in self._buffer[self._start:self._end], the buffer itself is never resized
+        self._buffer = self._checkout()
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self._needed = 0
+        self._scratch = None
         self._rep = None
 
+    def _checkout(self) -> bytearray:
+        if self.buffer_pool is None:
+            return bytearray(BufferPool.default_buffer_size)
+        return self.buffer_pool.checkout()
+
+    @property
+    def buffered(self) -> int:
+        """The number of received bytes which haven't been parsed into a request yet."""
+        return self._end - self._start
+
     def handle(self):
+        request = response = None
         try:
-            request = self.receive_request(self.socket)
-            if self.check_cleanup():
-                return request, None, False
-            logger.debug(str(request))
-            response = self.handler(request)
-            logger.log(9, f"\t\t{response}")
-            if self.check_cleanup():
-                return request, response, False
-            self.send_response(self.socket, response)
-            return request, response, True
+            first = True
+            while True:
+                # we only get past the first request if more data is already waiting or keep-alive is enabled
+                requests = self.receive_requests(timeout=self.timeout if first else (self.keep_alive_timeout or self.timeout))
+                first = False
+                if not requests:
+                    self.close()
+                    return request, response, False
+                n = len(requests)
+                for i, (request, response) in enumerate(self.process_all(requests)):
+                    if self.check_cleanup():
+                        return request, response, False
+                    if isinstance(response, SSEResponse):
+                        self.release_buffers()
+                        self.start_event_stream(response)
+                        return request, response, True
+                    if isinstance(response, WebSocketResponse):
+                        self.release_buffers()
+                        self.run_websocket(request, response)
+                        return request, response, True
+                    keep_alive = self.should_keep_alive(request, response, more_pending=i < n - 1)
+                    if self.compressor is not None:
+                        response = self.compressor.compress(request, response)
+                    keep_alive = self.send_response(self.socket, response, keep_alive=keep_alive,
+                                                    head_only=request.method == "HEAD",
+                                                    chunked_ok=request.version != "HTTP/1.0")
+                    if not keep_alive:
+                        self.close()
+                        return request, response, True
         except Exception as e:
             logger.error(f"Error handling request: {e}")
             try:
@@ -49,42 +293,316 @@ class Connection:
             self.close()
             raise e
 
-    def receive_request(self, connection_socket: socket.socket, chunk_size: int = None) -> Request:
-        connection_socket.settimeout(self.timeout)
+    def process(self, request: Request) -> Response:
+        logger.debug(str(request))
+        if WebSocket.is_upgrade_request(request):
+            request.websocket = WebSocket(self.socket, request, cleanup_event=self.cleanup_event)
+        response = self.handler(request)
+        logger.log(9, f"\t\t{response}")
+        return response
+
+    def process_all(self, requests: list):
+        """Yields (request, response) pairs in request order, running the handlers concurrently if there is an executor."""
+        if self.executor is None or len(requests) == 1 or any(WebSocket.is_upgrade_request(r) for r in requests):
+            for request in requests:
+                yield request, self.process(request)
+            return
+        futures = [self.executor.submit(self.process, request) for request in requests[1:]]
+        yield requests[0], self.process(requests[0])
+        for request, future in zip(requests[1:], futures):
+            # if the pool hasn't gotten to it yet, run it here rather than wait (this thread may be the pool's last free one)
+            if future.cancel():
+                yield request, self.process(request)
+            else:
+                yield request, future.result()
+
+    def receive_requests(self, timeout: float = None) -> list:
+        """Waits for the next request, then also parses every further request which is already fully buffered."""
+        request = self.receive_request(self.socket, timeout=timeout)
+        if request is None:
+            return []
+        requests = [request]
+        while self.buffered:
+            request = self._parse_buffered()
+            if request is None:
+                break
+            requests.append(request)
+        return requests
+
+    def receive_request(self, connection_socket: socket.socket, chunk_size: int = None, timeout: float = None) -> Request:
+        """Reads one request. Bytes past the end of it are kept as the start of the next one.
+
+        Returns None if the client closed the connection, or sent nothing within `timeout`, before a request started.
+        """
+        connection_socket.settimeout(self.timeout if timeout is None else timeout)
         if chunk_size is None:
             chunk_size = self.chunk_size
 
-        new_line = b'\r\n'
-        end_of_header = 2 * new_line
-
-        request_data = b''
         while not self.cleanup_event or not self.cleanup_event.is_set():
-            chunk = connection_socket.recv(chunk_size)
-            request_data += chunk
-            if end_of_header in request_data:
-                break
-            if not chunk:
-                break
+            request = self._parse_buffered()
+            if request is not None:
+                return request
+            self._reserve(max(chunk_size, min(self._needed, 1 << 20)))
+            try:
+                n = connection_socket.recv_into(self._view[self._end:])
+            except socket.timeout:
+                if not self.buffered:
+                    return None
+                raise
+            if not n:
+                return None
+            self._end += n
+            if timeout is not None and timeout != self.timeout:
+                # a request has started arriving, give it the normal timeout to finish
+                timeout = None
+                connection_socket.settimeout(self.timeout)
+        return None
 
-        # Extract headers
-        pre_body_bytes, body = request_data.split(end_of_header, 1)
+    def _reserve(self, n: int) -> None:
+        """Makes room for at least `n` more bytes after self._end, by compacting the buffer or, if need be, growing it."""
+        buffer = self._buffer
+        if len(buffer) - self._end >= n:
+            return
+        used = self._end - self._start
+        if used + n <= len(buffer):
+            if used:
+                buffer[:used] = buffer[self._start:self._end]
+        else:
+            # a request bigger than a pooled buffer, give this connection a larger private one
+            grown = bytearray(max(2 * len(buffer), used + n))
+            grown[:used] = buffer[self._start:self._end]
+            self._release_receive_buffer()
+            self._buffer = grown
+            self._view = memoryview(grown)
+        self._start = 0
+        self._end = used
 
-        # Parsing Content-Length if present for requests with body
+    def _parse_buffered(self):
+        """Parses a request from the buffer if one has fully arrived, otherwise returns None and leaves the buffer alone."""
+        buffer = self._buffer
+        start, buffered_end = self._start, self._end
+        while buffered_end - start >= 2 and buffer[start] == 13 and buffer[start + 1] == 10:
+            # stray line breaks between requests are allowed
+            start += 2
+        self._start = start
+        end_of_header = buffer.find(b"\r\n\r\n", start, buffered_end)
+        if end_of_header == -1:
+            self._needed = 0
+            return None
+        pre_body_bytes = bytes(self._view[start:end_of_header])
         lower = pre_body_bytes.lower()
-        if b'content-length: ' in lower:
-            length = int(lower.split(b'content-length: ')[1].split(new_line)[0])
-            while len(body) < length and ((not self.cleanup_event) or (not self.cleanup_event.is_set())):
-                body += connection_socket.recv(chunk_size)
+        body_start = end_of_header + 4
+
+        transfer_encoding = self._header_value(lower, b"transfer-encoding")
+        if transfer_encoding and b"chunked" in transfer_encoding:
+            body, end = self._parse_chunked(buffer, body_start, buffered_end)
+            if body is None:
+                self._needed = 0
+                return None
         else:
-            body = b''
+            length = self._header_value(lower, b"content-length")
+            end = body_start + (int(length) if length else 0)
+            if buffered_end < end:
+                self._needed = end - buffered_end
+                return None
+            body = RequestBody(self._view[body_start:end])
+        if end == buffered_end:
+            self._start = self._end = 0
+        else:
+            self._start = end
+        self._needed = 0
+        return Request.from_components(pre_body_bytes, body, self.client_addr, self.socket, origin=self.origin)
 
-        r = Request.from_components(pre_body_bytes, body, self.client_addr, self.socket, origin=self.origin)
-        return r
+    @staticmethod
+    def _header_value(lower_pre_body_bytes: bytes, name: bytes):
+        key = b"\r\n" + name + b":"
+        i = lower_pre_body_bytes.find(key)
+        if i == -1:
+            return None
+        i += len(key)
+        j = lower_pre_body_bytes.find(b"\r\n", i)
+        return lower_pre_body_bytes[i:j if j != -1 else None].strip()
 
-    def send_response(self, connection_socket: socket.socket, response: Response):
-        connection_socket.sendall(bytes(response))
-        connection_socket.shutdown(socket.SHUT_WR) # seems to be needed for linux?
-        connection_socket.close()
+    @staticmethod
+    def _parse_chunked(buffer, pos: int, buffered_end: int = None) -> tuple:
+        """Decodes a `Transfer-Encoding: chunked` body starting at `pos`. Returns (body, end) or (None, None) if incomplete."""
+        if buffered_end is None:
+            buffered_end = len(buffer)
+        body = bytearray()
+        while True:
+            line_end = buffer.find(b"\r\n", pos, buffered_end)
+            if line_end == -1:
+                return None, None
+            size = int(bytes(buffer[pos:line_end]).split(b";", 1)[0].strip(), 16)
+            pos = line_end + 2
+            if size == 0:
+                # skip any trailers, which end with an empty line
+                while True:
+                    line_end = buffer.find(b"\r\n", pos, buffered_end)
+                    if line_end == -1:
+                        return None, None
+                    if line_end == pos:
+                        return bytes(body), pos + 2
+                    pos = line_end + 2
+            if buffered_end < pos + size + 2:
+                return None, None
+            body += buffer[pos:pos + size]
+            pos += size + 2
+
+    def should_keep_alive(self, request: Request, response: Response, more_pending: bool = False) -> bool:
+        """Whether to leave the connection open after this response."""
+        connection = request.headers.get("Connection", "").lower()
+        if "close" in connection:
+            return False
+        if request.version == "HTTP/1.0" and "keep-alive" not in connection:
+            return False
+        if response.headers is not None and "close" in str(response.headers.get("Connection", "")).lower():
+            return False
+        if more_pending or self.buffered or self.keep_alive_timeout:
+            return True
+        return self._data_waiting()
+
+    def _data_waiting(self) -> bool:
+        if select is None:
+            return False
+        try:
+            readable, _, _ = select([self.socket], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return bool(readable)
+
+    def send_response(self, connection_socket: socket.socket, response: Response, keep_alive: bool = False,
+                      head_only: bool = False, chunked_ok: bool = True) -> bool:
+        """Writes the response. Returns whether the connection can stay open afterwards.
+
+        A StreamedResponse without a Content-Length is sent with chunked transfer encoding if `chunked_ok` (the client
+        speaks HTTP/1.1), otherwise its end is marked by closing the connection.
+        """
+        if isinstance(response, RawResponse) and response.headers is None:
+            # unparseable raw bytes, the only way to delimit them is to close the connection
+            connection_socket.sendall(bytes(response))
+            return False
+        body = response.body
+        extra_headers = ""
+        status_code = response.status_code
+        streamed = isinstance(response, StreamedResponse)
+        chunked = False
+        if "Content-Length" not in response.headers and not (status_code < 200 or status_code in (204, 304)):
+            if not streamed:
+                extra_headers += f"Content-Length: {len(body)}\r\n"
+            elif chunked_ok:
+                extra_headers += "Transfer-Encoding: chunked\r\n"
+                chunked = True
+            else:
+                keep_alive = False
+        if not keep_alive and "Connection" not in response.headers:
+            extra_headers += "Connection: close\r\n"
+        pre_body_bytes = response.pre_body_bytes(extra_headers)
+        if streamed:
+            connection_socket.sendall(pre_body_bytes)
+            if not head_only and not self._send_stream(connection_socket, response, chunked=chunked):
+                return False
+        elif head_only or not body:
+            connection_socket.sendall(pre_body_bytes)
+        else:
+            self._send_parts(connection_socket, pre_body_bytes, body)
+        return keep_alive
+
+    def _send_stream(self, connection_socket: socket.socket, response: StreamedResponse, chunked: bool = False) -> bool:
+        """Writes a StreamedResponse's parts, file slices straight from disk. Returns False if a file came up short."""
+        pending = []
+        for part in response.parts():
+            if not isinstance(part, FileSlice):
+                if part:
+                    pending.append(part)
+                continue
+            if pending:
+                self._send_bytes(connection_socket, b"".join(pending), chunked)
+                pending = []
+            if not part.count:
+                continue
+            if chunked:
+                connection_socket.sendall(f"{part.count:x}\r\n".encode())
+            if hasattr(connection_socket, "sendfile"):
+                with part.path.open("rb") as f:
+                    sent = connection_socket.sendfile(f, part.offset, part.count)
+            else:
+                sent = 0
+                for chunk in part.iter_chunks():
+                    connection_socket.sendall(chunk)
+                    sent += len(chunk)
+            if sent != part.count:
+                # the file shrank while being sent, the declared Content-Length can't be honoured
+                logger.warning(f"Sent {sent} of {part.count} bytes of {part.path}, closing the connection")
+                return False
+            if chunked:
+                connection_socket.sendall(b"\r\n")
+        if pending:
+            self._send_bytes(connection_socket, b"".join(pending), chunked)
+        if chunked:
+            connection_socket.sendall(b"0\r\n\r\n")
+        return True
+
+    @staticmethod
+    def _send_bytes(connection_socket: socket.socket, data: bytes, chunked: bool) -> None:
+        if chunked:
+            data = b"%x\r\n%b\r\n" % (len(data), data)
+        connection_socket.sendall(data)
+
+    def _send_parts(self, connection_socket: socket.socket, head: bytes, body: bytes) -> None:
+        """Writes head and body in one go without concatenating them into a new bytes object.
+
+        Small responses are copied into this connection's scratch buffer, larger ones are handed to sendmsg as they are.
+        """
+        size = len(head) + len(body)
+        if self._scratch is None and size <= (self.buffer_pool.buffer_size if self.buffer_pool is not None else BufferPool.default_buffer_size):
+            self._scratch = self._checkout()
+        if self._scratch is not None and size <= len(self._scratch):
+            view = memoryview(self._scratch)
+            view[:len(head)] = head
+            view[len(head):size] = body
+            connection_socket.sendall(view[:size])
+            view.release()
+            return
+        if not hasattr(connection_socket, "sendmsg"):
+            connection_socket.sendall(head)
+            connection_socket.sendall(body)
+            return
+        parts = [memoryview(head), memoryview(body)]
+        while parts:
+            sent = connection_socket.sendmsg(parts)
+            while parts and sent >= len(parts[0]):
+                sent -= len(parts[0])
+                parts.pop(0)
+            if parts and sent:
+                parts[0] = parts[0][sent:]
+
+    def start_event_stream(self, response: SSEResponse):
+        """Sends the SSE headers, then hands the socket to the server's pump (or streams inline if there is none)."""
+        self.socket.sendall(response.pre_body_bytes())
+        stream = EventStream(self.socket, response, self.cleanup_event)
+        if self.event_stream_pump is not None:
+            self.event_stream_pump.add(stream)
+            return
+        poll_interval = EventStreamPump.default_poll_interval
+        while not stream.closed:
+            EventStream.drop_disconnected([stream])
+            if not stream.step(monotonic()):
+                sleep(poll_interval)
+
+    def run_websocket(self, request: Request, response: WebSocketResponse):
+        """Completes the upgrade handshake and runs the websocket session on this thread until it returns."""
+        ws = request.websocket
+        try:
+            if ws.accept(response.subprotocols):
+                response.session()
+        except Exception as e:
+            logger.exception(e)
+            if not ws.closed and ws.accepted:
+                ws.close(1011, "internal error")
+        finally:
+            if not ws.closed:
+                ws.close()
 
     def check_cleanup(self):
         if self.cleanup_event and self.cleanup_event.is_set():
@@ -92,9 +610,32 @@ class Connection:
             return True
         return False
 
+    def _release_receive_buffer(self):
+        self._view.release()
+        if self.buffer_pool is not None:
+            self.buffer_pool.checkin(self._buffer)
+
+    def release_buffers(self):
+        """Returns this connection's buffers to the pool. Called once the connection no longer reads or writes HTTP."""
+        if self._buffer is None:
+            return
+        self._release_receive_buffer()
+        self._buffer = self._view = None
+        self._start = self._end = 0
+        if self._scratch is not None and self.buffer_pool is not None:
+            self.buffer_pool.checkin(self._scratch)
+        self._scratch = None
+
     def close(self):
-        self.socket.shutdown(socket.SHUT_WR) # seems to be needed for linux?
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.socket.shutdown(socket.SHUT_WR) # seems to be needed for linux?
+        except OSError:
+            pass
         self.socket.close()
+        self.release_buffers()
 
     def __repr__(self):
         if self._rep is None:
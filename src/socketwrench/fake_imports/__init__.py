@@ -30,12 +30,19 @@ except ImportError:
 
 try:
     raise_import_error_if_testing('zipfile')
-    from zipfile import ZipFile
+    from zipfile import ZipFile, ZipInfo, ZIP_STORED, ZIP_DEFLATED
 except ImportError:
     class ZipFile:
         def __init__(self, *args, **kwargs):
             raise ImportError("zipfile is not available.")
 
+    class ZipInfo:
+        def __init__(self, *args, **kwargs):
+            raise ImportError("zipfile is not available.")
+
+    ZIP_STORED = 0
+    ZIP_DEFLATED = 8
+
 
 try:
     raise_import_error_if_testing('argv')
@@ -85,19 +92,101 @@ except ImportError:
 
 try:
     raise_import_error_if_testing('time')
-    from time import sleep
+    from time import sleep, monotonic
 except ImportError:
     def sleep(seconds):
         pass
 
+    def monotonic():
+        return 0.0
+
 try:
     raise_import_error_if_testing('threading')
-    from threading import Event, Thread
+    from threading import Event, Thread, Lock
     from concurrent.futures import ThreadPoolExecutor
     threading_available = True
 except ImportError:
     threading_available = False
-    Event = Thread = ThreadPoolExecutor = None
+    Event = Thread = Lock = ThreadPoolExecutor = None
+
+try:
+    raise_import_error_if_testing('queue')
+    from queue import Empty
+except ImportError:
+    class Empty(Exception):
+        pass
+
+try:
+    raise_import_error_if_testing('select')
+    from select import select
+except ImportError:
+    select = None
+
+# only used for websockets
+try:
+    raise_import_error_if_testing('hashlib')
+    from hashlib import sha1
+except ImportError:
+    sha1 = None
+
+try:
+    raise_import_error_if_testing('base64')
+    from base64 import b64encode
+except ImportError:
+    def b64encode(data: bytes) -> bytes:
+        alphabet = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+        out = bytearray()
+        for i in range(0, len(data), 3):
+            chunk = data[i:i + 3]
+            n = int.from_bytes(chunk + bytes(3 - len(chunk)), "big")
+            for j in range(4):
+                out.append(alphabet[(n >> (18 - 6 * j)) & 63] if j <= len(chunk) else 61)
+        return bytes(out)
+
+try:
+    raise_import_error_if_testing('os')
+    from os import urandom
+except ImportError:
+    def urandom(n: int) -> bytes:
+        return bytes(n)
+
+try:
+    raise_import_error_if_testing('stat')
+    from stat import S_ISDIR
+except ImportError:
+    def S_ISDIR(mode: int) -> bool:
+        return (mode & 0o170000) == 0o040000
+
+# only used for http dates (Last-Modified, If-Modified-Since)
+try:
+    raise_import_error_if_testing('email')
+    from email.utils import formatdate, parsedate_to_datetime
+except ImportError:
+    def formatdate(timeval: float = None, localtime: bool = False, usegmt: bool = False) -> str:
+        days, seconds = divmod(int(timeval or 0), 86400)
+        weekday = ("Thu", "Fri", "Sat", "Sun", "Mon", "Tue", "Wed")[days % 7]
+        # days since the epoch to a civil date
+        z = days + 719468
+        era = z // 146097
+        doe = z - era * 146097
+        yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+        doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+        mp = (5 * doy + 2) // 153
+        day = doy - (153 * mp + 2) // 5 + 1
+        month = mp + 3 if mp < 10 else mp - 9
+        year = yoe + era * 400 + (month <= 2)
+        months = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+        return f"{weekday}, {day:02d} {months[month - 1]} {year} {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d} GMT"
+
+    def parsedate_to_datetime(data: str):
+        raise ValueError("email.utils is not available to parse dates.")
+
+# only used to compress responses
+try:
+    raise_import_error_if_testing('zlib')
+    import zlib
+except ImportError:
+    zlib = None
 
 try:
     raise_import_error_if_testing('traceback')
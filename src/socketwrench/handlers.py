@@ -3,16 +3,28 @@ from socketwrench.standardlib_dependencies import (
     builtins,
     inspect,
     loads,
+    Lock,
     logging,
+    monotonic,
+    parsedate_to_datetime,
     Path,
+    S_ISDIR,
+    sha1,
     socket,
     wraps
 )
 
+import socketwrench.json_codec as json_codec
 from socketwrench.tags import tag, get, gettag
 from socketwrench.types import Request, Response, Query, Body, Route, FullPath, Method, File, ClientAddr, \
     HTTPStatusCode, ErrorResponse, Headers, ErrorModes, FileResponse, HTMLResponse, url_decode, StandardHTMLResponse, \
-    status_code_names, FileUpload, FileUploads, FormData, FileName, FileType, HTTPStatusCodeResponses
+    status_code_names, FileUpload, FileUploads, FormData, FileName, FileType, HTTPStatusCodeResponses, SSEResponse, \
+    WebSocketResponse, StreamedFileResponse, PrebuiltResponse, JSONResponse, json_encoder_for
+from socketwrench.websockets import WebSocket
+from socketwrench.cache import LRUCache
+from socketwrench.batching import Batcher, SingleFlight
+from socketwrench.response_cache import response_cache
+from socketwrench.compress import choose_encoding, available_encodings, compressor
 
 logger = logging.getLogger("socketwrench")
 
@@ -74,11 +86,17 @@ class Autofill:
     def client_addr(self, request: Request) -> ClientAddr:
         return ClientAddr(request.client_addr)
 
+    def websocket(self, request: Request) -> WebSocket:
+        return request.websocket
+
     def autofill(self, special_params: dict):
+        # only look up the values some parameter actually asks for
+        fillers = [(getattr(self, k), values) for k, values in special_params.items() if values]
+
         def f(request) -> dict:
             d = {}
-            for k, values in special_params.items():
-                v = getattr(self, k)(request)
+            for fill, values in fillers:
+                v = fill(request)
                 for _k in values:
                     d[_k] = v
             return d
@@ -100,6 +118,7 @@ available_types = {
     "form_data": FormData,
     "client_addr": ClientAddr,
     "socket": socket.socket,
+    "websocket": WebSocket,
 }
 
 def tryissubclass(a, others):
@@ -120,63 +139,95 @@ def _typehint_matches(typehint, others):
     return typehint in others or tryissubclass(typehint, others) or (hasattr(typehint, "__origin__") and typehint.__origin__ in others) or (hasattr(typehint, "__args__") and any(_typehint_matches(t, others) for t in typehint.__args__))
 
 
-def cast_to_typehint(value: str, typehint = inspect.Parameter.empty):
+_typehint_tests = {
+    "int": lambda t: _typehint_matches(t, [int, inspect.Parameter.empty]),
+    "float": lambda t: _typehint_matches(t, [float, inspect.Parameter.empty]),
+    "bool_or_empty": lambda t: _typehint_matches(t, [bool, inspect.Parameter.empty]),
+    "none": lambda t: _typehint_matches(t, [None]) or not _typehint_matches(t, [str]),
+    "bool": lambda t: _typehint_matches(t, [bool]),
+    "list": lambda t: _typehint_matches(t, [list, inspect.Parameter.empty]),
+    "tuple": lambda t: _typehint_matches(t, [tuple, inspect.Parameter.empty]),
+    "dict": lambda t: _typehint_matches(t, [dict, inspect.Parameter.empty]),
+    "frozenset": lambda t: _typehint_matches(t, [frozenset]),
+    "set": lambda t: _typehint_matches(t, [set, inspect.Parameter.empty]),
+    "bytes": lambda t: t is bytes or tryissubclass(t, bytes),
+    "bytearray": lambda t: t is bytearray or tryissubclass(t, bytearray),
+    "memoryview": lambda t: t is memoryview or tryissubclass(t, memoryview),
+}
+_typehint_checks = {}
+
+
+def _check_typehint(typehint, name: str) -> bool:
+    """Whether one of cast_to_typehint's casts applies to a typehint. That only depends on the typehint, so it is
+    worked out once per typehint rather than on every call."""
+    key = (typehint, name)
+    try:
+        return _typehint_checks[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # unhashable typehint
+        return _typehint_tests[name](typehint)
+    result = _typehint_checks[key] = _typehint_tests[name](typehint)
+    return result
 
+
+def cast_to_typehint(value: str, typehint = inspect.Parameter.empty):
     # unless specifically typed as a string, cast any numeric value to int or float
-    if _typehint_matches(typehint, [int, inspect.Parameter.empty]):
+    if _check_typehint(typehint, "int"):
         if value.isdigit() or (value.startswith("-") and value[1:].isdigit())  and not '.' in value:
             return int(value)
-    if _typehint_matches(typehint, [float, inspect.Parameter.empty]):
+    if _check_typehint(typehint, "float"):
         if value.count(".") <= 1 and value.replace(".", "").isdigit() or (value.startswith("-") and value[1:].replace(".", "").isdigit()):
             return float(value)
-    if _typehint_matches(typehint, [bool, inspect.Parameter.empty]):
+    if _check_typehint(typehint, "bool_or_empty"):
         if value.lower() in ["false", "f", "no", "n"]:
             return False
         if value.lower() in ["true", "t", "yes", "y"]:
             return True
-    if value.lower() in ["none", "null"] and (_typehint_matches(typehint, [None]) or not _typehint_matches(typehint, [str])):
+    if value.lower() in ["none", "null"] and _check_typehint(typehint, "none"):
         return None
-    if _typehint_matches(typehint, [bool]):
+    if _check_typehint(typehint, "bool"):
         if value.lower() in ["0"]:
             return False
         if value.lower() in ["1", "ok"]:
             return True
-    if _typehint_matches(typehint, [list, inspect.Parameter.empty]):
+    if _check_typehint(typehint, "list"):
         if value.startswith("[") and value.endswith("]"):
             try:
                 return loads(value)
             except:
                 pass
-    if _typehint_matches(typehint, [tuple, inspect.Parameter.empty]):
+    if _check_typehint(typehint, "tuple"):
         if value.startswith("(") and value.endswith(")"):
             try:
                 s = '[' + value[1:-1] + ']'
                 return tuple(loads(s))
             except:
                 pass
-    if _typehint_matches(typehint, [dict, inspect.Parameter.empty]):
+    if _check_typehint(typehint, "dict"):
         if value.startswith("{") and value.endswith("}"):
             try:
                 return loads(value)
             except:
                 pass
-    if _typehint_matches(typehint, [frozenset]):
+    if _check_typehint(typehint, "frozenset"):
         if value.startswith("{") and value.endswith("}"):
             try:
                 return frozenset(loads('[' + value[1:-1] + ']'))
             except:
                 pass
-    if _typehint_matches(typehint, [set, inspect.Parameter.empty]):
+    if _check_typehint(typehint, "set"):
         if value.startswith("{") and value.endswith("}"):
             try:
                 return set(loads('[' + value[1:-1] + ']'))
             except:
                 pass
-    if typehint is bytes or tryissubclass(typehint, bytes):
+    if _check_typehint(typehint, "bytes"):
         return value.encode()
-    if typehint is bytearray or tryissubclass(typehint, bytearray):
+    if _check_typehint(typehint, "bytearray"):
         return bytearray(value.encode())
-    if typehint is memoryview or tryissubclass(typehint, memoryview):
+    if _check_typehint(typehint, "memoryview"):
         return memoryview(value.encode())
     if typehint is type:
         if builtins and hasattr(builtins, value):
@@ -189,6 +240,18 @@ def cast_to_typehint(value: str, typehint = inspect.Parameter.empty):
     return value
 
 
+def _typehint_caster(typehint):
+    """`cast_to_typehint` for one typehint, or None if it gives every value back as it is (e.g. for `str`)."""
+    try:
+        unchanged = typehint is not type and not hasattr(typehint, "__origin__") and \
+            not any(_check_typehint(typehint, name) for name in _typehint_tests)
+    except Exception:
+        unchanged = False
+    if unchanged:
+        return None
+    return lambda value: cast_to_typehint(value, typehint)
+
+
 def cast_to_types(query, signature):
     for param_name, param_value in query.items():
         if param_name in signature:
@@ -200,6 +263,25 @@ def cast_to_types(query, signature):
     return query
 
 
+# bodies of these types (or none) which look like a JSON object are read as one
+_loose_json_types = ("", "text/plain", "application/x-www-form-urlencoded")
+
+
+def _add_json_args(body: dict, args: list, kwargs: dict) -> bool:
+    """Adds a JSON object's "0", "1", ... keys to `args` and the rest to `kwargs`. Returns False, adding nothing, if the
+    numbered keys don't carry on from the positional args already given."""
+    int_keys = sorted([int(k) for k in body if k.isdigit()])
+    if set(int_keys) != set(range(len(args), len(args) + len(int_keys))):
+        return False
+    if int_keys:
+        # the parsed body is cached on the Request, so leave it as it is
+        body = dict(body)
+        for k in int_keys:
+            args.append(body.pop(str(k)))
+    kwargs.update(body)
+    return True
+
+
 def preprocess_args(_handler):
     sig = inspect.signature(_handler)
     ignore_special_names = getattr(_handler, "ignore_special_names", config["ignore_special_names"])
@@ -252,11 +334,37 @@ def preprocess_args(_handler):
 
 
     get_autofill_kwargs = autofill.autofill(special_params)
-
-    def parser(request: Request, route_params: dict = None) -> tuple[tuple, dict, type]:
-        route_params = cast_to_types(route_params, sig.parameters) if route_params else {}
-        if not sig.parameters:
-            return (), {}, sig.return_annotation
+    parameters = sig.parameters
+    param_names = list(parameters)
+    return_annotation = sig.return_annotation
+    autofilled = {name for names in special_params.values() for name in names}
+    # *args and **kwargs count as inputs, since they collect whatever the request sends
+    takes_input = any(name not in autofilled for name in parameters)
+
+    takes_var_kwargs = any(p.kind == p.VAR_KEYWORD for p in parameters.values())
+    form_params = {name for name in parameters if name not in autofilled}
+
+    # the invoker is specialised here, once, so each call only does the stages this handler's signature can use
+    if not parameters:
+        def parser(request: Request, route_params: dict = None) -> tuple[tuple, dict, type]:
+            return (), {}, return_annotation
+
+        tag(parser, autofill=special_params, sig=sig)
+        return parser
+
+    if not takes_input:
+        # every parameter is autofilled, so the query, body and form fields have nowhere to go
+        def parser(request: Request, route_params: dict = None) -> tuple[tuple, dict, type]:
+            kwargs = get_autofill_kwargs(request)
+            if route_params:
+                kwargs.update(cast_to_types(route_params, parameters))
+            return (), kwargs, return_annotation
+
+        tag(parser, autofill=special_params, sig=sig)
+        return parser
+
+    def parse(request: Request, route_params: dict = None) -> tuple[tuple, dict, type]:
+        route_params = cast_to_types(route_params, parameters) if route_params else {}
         args = []
         kwargs = get_autofill_kwargs(request)
         q = request.path.query_args()
@@ -268,32 +376,45 @@ def preprocess_args(_handler):
             for k in int_keys:
                 v = q.pop(str(k))
                 if k < args_before_collector:
-                    param_name = list(sig.parameters)[k]
                     try:
-                        v = cast_to_typehint(v, sig.parameters[param_name].annotation)
+                        v = cast_to_typehint(v, parameters[param_names[k]].annotation)
                     except:
                         pass
                 args.append(v)
-            q = cast_to_types(q, sig.parameters)
+            q = cast_to_types(q, parameters)
             kwargs.update(q)
 
         b = request.body
         if b:
-            try:
-                body = loads(b.decode())
-                int_keys = sorted([int(k) for k in body if k.isdigit()])
-                if set(int_keys) != set(range(len(args), len(args) + len(int_keys))):
-                    raise ValueError("Unable to parse args.")
-                for k in int_keys:
-                    args.append(body.pop(str(k)))
-                kwargs.update(body)
-            except:
-                pass
+            # decode the body according to what it says it is, rather than trying JSON on everything
+            media_type = request.media_type
+            if media_type == "application/json" or media_type.endswith("+json"):
+                try:
+                    body = request.json
+                except ValueError:
+                    raise HTTPStatusCodeResponses.BAD_REQUEST(b"Invalid JSON body")
+                if isinstance(body, dict) and not _add_json_args(body, args, kwargs):
+                    raise HTTPStatusCodeResponses.BAD_REQUEST(b"Unable to parse args.")
+            elif media_type in _loose_json_types and b[:64].lstrip()[:1] == b"{":
+                # clients which don't say what they are sending, or say it wrong (curl -d sends everything as a form),
+                # usually mean a JSON object
+                try:
+                    body = request.json
+                except ValueError:
+                    body = None
+                if isinstance(body, dict):
+                    _add_json_args(body, args, kwargs)
+            elif media_type == "application/x-www-form-urlencoded":
+                form = request.form
+                if not takes_var_kwargs:
+                    # fields the handler has no parameter for are ignored, rather than failing the call
+                    form = {k: v for k, v in form.items() if k in form_params}
+                kwargs.update(cast_to_types(form, parameters))
 
         for k, v in request.form_data.items():
             if not v.is_file:
-                if sig.parameters.get(k):
-                    v = cast_to_typehint(v, sig.parameters[k].annotation)
+                if parameters.get(k):
+                    v = cast_to_typehint(v, parameters[k].annotation)
             kwargs[k] = v
 
         kwargs.update(route_params)
@@ -302,18 +423,107 @@ def preprocess_args(_handler):
             args = tuple(kwargs.pop("args"))
         else:
             args = tuple(args)
-        return args, kwargs, sig.return_annotation
+        return args, kwargs, return_annotation
+
+    if autofilled or any(p.kind not in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY) for p in parameters.values()):
+        tag(parse, autofill=special_params, sig=sig)
+        return parse
+
+    # only named parameters, so a request without a body or numbered query keys is just its query, cast
+    casters = {name: _typehint_caster(param.annotation) for name, param in parameters.items()}
+
+    def parser(request: Request, route_params: dict = None) -> tuple[tuple, dict, type]:
+        if request.body:
+            return parse(request, route_params)
+        q = request.path.query_args()
+        for k, v in q.items():
+            cast = casters.get(k)
+            if cast is not None:
+                try:
+                    q[k] = cast(v)
+                except:
+                    pass
+            elif k.isdigit():
+                return parse(request, route_params)
+        if route_params:
+            q.update(cast_to_types(route_params, parameters))
+        return (), q, return_annotation
 
     tag(parser, autofill=special_params, sig=sig)
     return parser
 
+def _batcher_for(_handler, options: dict, sse_options=None, websocket_options=None) -> Batcher:
+    """A Batcher calling `_handler` with a list of values per parameter, one from each request in the batch."""
+    if sse_options is not None or websocket_options is not None:
+        raise ValueError(f"{_handler} can't be both batched and a stream")
+    sig = inspect.signature(_handler)
+    names = list(sig.parameters)
+    if not names:
+        # with nothing to get a list of, the handler couldn't tell how many requests it is answering
+        raise ValueError(f"Batched handler {_handler} must take at least one parameter, which gets the list of values "
+                         f"from the batched requests")
+    for param in sig.parameters.values():
+        if param.kind in (param.POSITIONAL_ONLY, param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            raise ValueError(f"Batched handler {_handler} can't take positional-only parameters, *args or **kwargs")
+
+    def call(items: list):
+        return _handler(**{name: [item[name] for item in items] for name in names})
+
+    return Batcher(call, **options)
+
+
+def _coalesce(_handler, wrapper, sse_options=None, websocket_options=None):
+    """Wraps `wrapper` so concurrent GET/HEAD requests with the same route and query share one call (and Response)."""
+    if sse_options is not None or websocket_options is not None:
+        raise ValueError(f"{_handler} can't be both coalesced and a stream")
+    flight = SingleFlight()
+
+    @wraps(_handler)
+    def coalescing_wrapper(request: Request, route_params: dict = None) -> Response:
+        if request.method not in ("GET", "HEAD"):
+            return wrapper(request, route_params)
+        key = (request.method, request.path.route(), tuple(sorted(request.path.query_args().items())))
+        return flight.do(key, lambda: wrapper(request, route_params))
+
+    tag(coalescing_wrapper, single_flight=flight)
+    return coalescing_wrapper
+
+
+def constant_handler(wrapped, route: str):
+    """Calls the wrapped handler of a `@constant` route once, now, and returns a handler which sends its response,
+    serialized once, to every request. Returns `wrapped` itself if the response can't be kept (a stream or an error)."""
+    sig = gettag(wrapped, "sig", None)
+    if sig is not None and sig.parameters:
+        raise ValueError(f"Constant handler {wrapped} for {route} can't take parameters")
+    request = Request.from_components(f"GET {route} HTTP/1.1\r\nHost: localhost".encode(), b"", ("127.0.0.1", 0))
+    response = wrapped(request)
+    prebuilt = PrebuiltResponse.from_response(response) if response.status_code < 500 else None
+    if prebuilt is None:
+        logger.warning(f"The response of constant route {route} can't be prebuilt, it will be computed per request")
+        return wrapped
+
+    @wraps(wrapped)
+    def send_constant(request: Request) -> Response:
+        return prebuilt.for_version(request.version)
+
+    # there is nothing left to cache
+    send_constant.__dict__.pop("cached", None)
+    return send_constant
+
+
 @tag(accepts_route_params=True)
 def wrap_handler(_handler, error_mode: str = None):
     """Converts any method into a method that takes a Request and returns a Response."""
     if getattr(_handler, "is_wrapped", False):
         return _handler
     parser = preprocess_args(_handler)
-
+    sse_options = gettag(_handler, "sse", None)
+    websocket_options = gettag(_handler, "websocket", None)
+    compress = gettag(_handler, "compress", True)
+    # how to encode what the handler returns is decided here, once, from its return annotation
+    json_encoder = json_encoder_for(getattr(parser, "sig", inspect.signature(_handler)).return_annotation)
+    batch_options = gettag(_handler, "batched", None)
+    batcher = _batcher_for(_handler, batch_options, sse_options, websocket_options) if batch_options is not None else None
 
     # make a stub function that takes the same parameters as the handler but doesn't do anything
     # use inspect.signature to get the parameters
@@ -322,15 +532,30 @@ def wrap_handler(_handler, error_mode: str = None):
     def wrapper(request: Request, route_params: dict = None) -> Response:
         try:
             if parser is None:
-                r = _handler()
+                r = batcher.submit({}) if batcher is not None else _handler()
                 response = Response(r, version=request.version)
             else:
                 a, kw, return_annotation = parser(request, route_params=route_params)
-                r = _handler(*a, **kw)
+                if websocket_options is not None:
+                    if request.websocket is None:
+                        raise HTTPStatusCodeResponses.UPGRADE_REQUIRED(b"Upgrade Required", headers={"Upgrade": "websocket"})
+                    # the connection runs the handler itself once the handshake has been sent
+                    return WebSocketResponse(lambda: _handler(*a, **kw), version=request.version, **websocket_options)
+                if batcher is not None:
+                    # bind here, so a request with missing arguments fails on its own instead of failing the batch
+                    bound = parser.sig.bind(*a, **kw)
+                    bound.apply_defaults()
+                    r = batcher.submit(bound.arguments)
+                else:
+                    r = _handler(*a, **kw)
                 if isinstance(r, Response):
                     response = r
                 elif isinstance(r, HTTPStatusCode):
                     response = Response(r.phrase(), status_code=r, version=request.version)
+                elif sse_options is not None:
+                    response = SSEResponse(r, version=request.version, **sse_options)
+                elif json_encoder is not None and type(r) is json_encoder[0]:
+                    response = JSONResponse(r, version=request.version, encoder=json_encoder[1])
                 else:
                     try:
                         if (not isinstance(return_annotation, str)) and issubclass(return_annotation, Response):
@@ -374,8 +599,14 @@ def wrap_handler(_handler, error_mode: str = None):
                 if isinstance(e, t):
                     status_code = c
             response = ErrorResponse(msg.encode(), version=request.version, status_code=status_code)
+        if not compress:
+            response.compressible = False
         return response
 
+    if batcher is not None:
+        tag(wrapper, batcher=batcher)
+    if gettag(_handler, "coalesced", False):
+        wrapper = _coalesce(_handler, wrapper, sse_options, websocket_options)
     tag(wrapper,
         is_wrapped=True,
         sig=getattr(parser, "sig", inspect.signature(_handler)),
@@ -394,16 +625,281 @@ class MatchableHandlerABC:
         raise NotImplementedError
 
 
+class CachedFile:
+    """A small file held in memory by a StaticFileHandler, with its 200 response headers already serialized."""
+    __slots__ = ("path", "stat_key", "etag", "last_modified", "mtime", "headers", "header_block", "body", "checked_at")
+
+    def __init__(self, path: Path, stat_result, body: bytes, headers: dict):
+        headers = Headers(headers)
+        if "Content-Type" not in headers:
+            headers["Content-Type"] = FileResponse.content_types.get(path.suffix[1:].lower(), FileResponse.content_types[None])
+        headers["Content-Length"] = str(len(body))
+        self.path = path
+        self.stat_key = (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+        self.etag = headers["ETag"]
+        self.last_modified = headers["Last-Modified"]
+        self.mtime = stat_result.st_mtime
+        self.headers = headers
+        self.header_block = headers.to_bytes()
+        self.body = body
+        self.checked_at = monotonic()
+
+    def response(self, version: str = "HTTP/1.1") -> PrebuiltResponse:
+        return PrebuiltResponse(self.header_block, self.body, self.headers, version=version)
+
+
+class StaticAsset:
+    """A file which doesn't change while the server runs (the docs pages, the favicon), or bytes generated once (the
+    OpenAPI schema). It is read on first use and kept as ready-to-send responses, identity and gzipped, with an ETag
+    from its contents."""
+
+    def __init__(self, path: Path = None, content_type: str = None, body: bytes = None):
+        self.path = Path(path) if path is not None else None
+        if content_type is None:
+            content_type = FileResponse.content_types.get(self.path.suffix[1:].lower() if self.path else None,
+                                                          FileResponse.content_types[None])
+        self.content_type = content_type
+        self._body = body
+        self._variants = None
+
+    def load(self) -> dict:
+        """{content coding or None: (etag, headers, header block, body)}, reading the file the first time."""
+        variants = self._variants
+        if variants is not None:
+            return variants
+        body = self._body if self._body is not None else self.path.read_bytes()
+        self._body = None
+        digest = sha1(body).hexdigest()[:20]
+        gzipped = None
+        if "gzip" in available_encodings():
+            c = compressor("gzip", 9)
+            gzipped = c.compress(body) + c.flush()
+            if len(gzipped) >= len(body):
+                gzipped = None
+        vary = {"Vary": "Accept-Encoding"} if gzipped is not None else {}
+        variants = {None: self._variant(body, f'"{digest}"', vary)}
+        if gzipped is not None:
+            variants["gzip"] = self._variant(gzipped, f'"{digest}-gz"', {"Content-Encoding": "gzip", **vary})
+        self._variants = variants
+        return variants
+
+    def _variant(self, body: bytes, etag: str, headers: dict = None) -> tuple:
+        headers = Headers(headers or {})
+        headers["Content-Type"] = self.content_type
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "no-cache"
+        headers["Content-Length"] = str(len(body))
+        return etag, headers, headers.to_bytes(), body
+
+    def __call__(self, request: Request = None) -> Response:
+        variants = self.load()
+        if request is None:
+            etag, headers, header_block, body = variants[None]
+            return PrebuiltResponse(header_block, body, headers)
+        encoding = None
+        if "gzip" in variants:
+            encoding = choose_encoding(request.headers.get("Accept-Encoding"), ("gzip",))
+        etag, headers, header_block, body = variants[encoding]
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+            return Response(b"", status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"},
+                            version=request.version)
+        return PrebuiltResponse(header_block, body, headers, version=request.version)
+
+
+class DirectoryListing:
+    """A folder's entries as of its mtime, as read by a StaticFileHandler. Sorted orders and rendered pages are built
+    on first use and kept until the folder changes, so paging through a big folder never re-reads it. Requests for the
+    same folder share one listing, so whatever they add to it is added under a lock."""
+    __slots__ = ("path", "mtime_ns", "entries", "_orders", "_pages", "_size", "_lock")
+    sort_keys = {
+        "name": lambda e: e[0],
+        "size": lambda e: e[2],
+        "mtime": lambda e: e[3],
+    }
+    max_rendered_pages = 32
+
+    def __init__(self, path: Path, stat_result):
+        entries = []
+        for child in path.iterdir():
+            try:
+                st = child.stat()
+            except OSError:
+                continue
+            entries.append(self.entry(child.name, st))
+        self.path = path
+        self.mtime_ns = stat_result.st_mtime_ns
+        self.entries = entries
+        self._orders = {}
+        self._pages = {}
+        self._size = self._entries_size(entries)
+        self._lock = Lock() if Lock is not None else None
+
+    def _acquire(self):
+        if self._lock is not None:
+            self._lock.acquire()
+
+    def _release(self):
+        if self._lock is not None:
+            self._lock.release()
+
+    @staticmethod
+    def _entries_size(entries: list) -> int:
+        return sum(len(e[0]) + 64 for e in entries)
+
+    @staticmethod
+    def entry(name: str, stat_result) -> tuple:
+        """(name, is_dir, size, mtime)"""
+        return name, S_ISDIR(stat_result.st_mode), stat_result.st_size, stat_result.st_mtime
+
+    def size(self) -> int:
+        """A rough count of the bytes held, for the listing cache's budget. Kept up to date as pages are added."""
+        return self._size
+
+    def add(self, name: str, stat_result, dir_stat_result) -> None:
+        """Records a file this process just wrote to the folder, instead of reading the whole folder again."""
+        self._acquire()
+        try:
+            entries = [e for e in self.entries if e[0] != name]
+            entries.append(self.entry(name, stat_result))
+            self.entries = entries
+            self.mtime_ns = dir_stat_result.st_mtime_ns
+            # fresh dicts rather than cleared ones, so orders and pages still being built from the old entries land
+            # in the old dicts
+            self._orders = {}
+            self._pages = {}
+            self._size = self._entries_size(entries)
+        finally:
+            self._release()
+
+    def ordered(self, sort: str = "name", descending: bool = False) -> list:
+        """Folders first, then files, each group sorted by `sort`."""
+        orders = self._orders
+        order = orders.get((sort, descending))
+        if order is None:
+            key = self.sort_keys[sort]
+            entries = self.entries
+            dirs = sorted((e for e in entries if e[1]), key=key, reverse=descending)
+            files = sorted((e for e in entries if not e[1]), key=key, reverse=descending)
+            order = orders[(sort, descending)] = dirs + files
+        return order
+
+    def page(self, route: str, fmt: str = "html", sort: str = "name", descending: bool = False, page: int = 1,
+             per_page: int = 1000) -> bytes:
+        """One page of the listing, as HTML links under `route` or as JSON."""
+        k = (route, fmt, sort, descending, page, per_page)
+        pages = self._pages
+        body = pages.get(k)
+        if body is not None:
+            return body
+        order = self.ordered(sort, descending)
+        entries = order[(page - 1) * per_page:page * per_page]
+        n_pages = max((len(order) + per_page - 1) // per_page, 1)
+        if fmt == "json":
+            body = json_codec.codec.dumps({
+                "path": route,
+                "page": page,
+                "per_page": per_page,
+                "pages": n_pages,
+                "total": len(order),
+                "entries": [{"name": name, "is_dir": is_dir, "size": size, "mtime": mtime}
+                            for name, is_dir, size, mtime in entries],
+            })
+        else:
+            base = route.rstrip("/")
+            items = "\n".join(
+                f"<li><a href='{base}/{_url_quote(name)}{'/' if is_dir else ''}'>{_html_escape(name)}{'/' if is_dir else ''}</a></li>"
+                for name, is_dir, _, _ in entries)
+            nav = ""
+            if n_pages > 1:
+                query = f"sort={sort}&order={'desc' if descending else 'asc'}&per_page={per_page}"
+                nav = "<p>" + (f"<a href='{base}/?{query}&page={page - 1}'>previous</a> " if page > 1 else "") + \
+                      f"page {page} of {n_pages}" + \
+                      (f" <a href='{base}/?{query}&page={page + 1}'>next</a>" if page < n_pages else "") + "</p>"
+            body = f"<!DOCTYPE html><html><body><ul>{items}</ul>{nav}</body></html>".encode()
+        self._acquire()
+        try:
+            if pages is self._pages and k not in pages:
+                if len(pages) >= self.max_rendered_pages:
+                    self._size -= sum(len(b) for b in pages.values())
+                    pages = self._pages = {}
+                pages[k] = body
+                self._size += len(body)
+        finally:
+            self._release()
+        return body
+
+
+_unreserved = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+def _url_quote(s: str) -> str:
+    return "".join(chr(b) if b in _unreserved else f"%{b:02X}" for b in s.encode())
+
+
+def _html_escape(s: str) -> str:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("'", "&#x27;").replace('"', "&quot;")
+
+
 class StaticFileHandler(MatchableHandlerABC):
     is_wrapped = True
     allowed_methods = ["GET", "HEAD"]
+    default_stream_threshold = 256 * 1024
+    default_cache_max_bytes = LRUCache.default_max_bytes
+    default_cache_max_file_size = 64 * 1024
+    default_revalidate_interval = 1.0
+    default_negative_cache_size = 1024
+    default_negative_cache_ttl = 5.0
+    default_listing_cache_max_bytes = 4 * 1024 * 1024
+    default_listing_page_size = 1000
+    max_listing_page_size = 10000
+    # sibling suffix for each content coding, most preferred first
+    default_precompressed = {"zstd": ".zst", "br": ".br", "gzip": ".gz"}
+    sibling_cache_size = 4096
 
     def __init__(self, path = "static",
                  route: str = None,
                  allow_uploads=False,
                  overwrite=False,
                  allow_downloads=True,
+                 weak_etags=False,
+                 stream_threshold: int = default_stream_threshold,
+                 cache_max_bytes: int = default_cache_max_bytes,
+                 cache_max_file_size: int = default_cache_max_file_size,
+                 revalidate_interval: float = default_revalidate_interval,
+                 negative_cache_size: int = default_negative_cache_size,
+                 negative_cache_ttl: float = default_negative_cache_ttl,
+                 precompressed: dict = default_precompressed,
+                 listing_cache_max_bytes: int = default_listing_cache_max_bytes,
+                 listing_page_size: int = default_listing_page_size,
                  ):
+        """Serves (and optionally accepts uploads to) a folder.
+
+        Files are sent with `ETag` and `Last-Modified` validators, and conditional GET/HEAD requests
+        (`If-None-Match` / `If-Modified-Since`) for unchanged files are answered 304 from a `stat()` alone.
+        Use `weak_etags=True` to mark the ETags as weak (e.g. if the files are rewritten with identical content).
+
+        `Range` requests (with `If-Range`) get 206 Partial Content, or 416 if nothing requested is in the file. Ranges,
+        and whole files of at least `stream_threshold` bytes, are sent from disk with sendfile instead of read into memory.
+
+        Files of up to `cache_max_file_size` bytes are kept in an LRU cache of `cache_max_bytes` (0 disables it), together
+        with their serialized headers. A cached file is served without touching the disk, and is re-stat'ed at most once
+        every `revalidate_interval` seconds to notice changes. Cache stats are available from `handler.cache.stats()`.
+
+        Paths which turned out not to exist are remembered (up to `negative_cache_size` of them, for `negative_cache_ttl`
+        seconds, 0 disables it) so repeated junk requests are rejected without touching the disk. Uploads clear it, but
+        a file created by other means may take up to `negative_cache_ttl` seconds to appear.
+
+        If the client accepts it, a precompressed sibling (`app.js.zst`, `app.js.br`, `app.js.gz` for `app.js`, see
+        `precompressed`) is sent instead of the file, with its Content-Encoding and the original's Content-Type. Siblings
+        older than the file are ignored. Which siblings exist is cached and rechecked every `revalidate_interval` seconds.
+        Pass `precompressed=None` to turn this off.
+
+        Folders without an index.html get a listing, folders first then files, `listing_page_size` entries per page.
+        The query picks `page`, `per_page`, `sort` (name, size or mtime) and `order` (asc or desc), and `format=json` (or
+        an `Accept: application/json` header) returns JSON instead of HTML. Listings are cached (up to
+        `listing_cache_max_bytes`, 0 disables it) until the folder's mtime changes, and uploads update them in place.
+        """
         path = Path(path)
         path.mkdir(parents=True, exist_ok=True)
         self.path = path
@@ -417,17 +913,51 @@ class StaticFileHandler(MatchableHandlerABC):
         self.allow_uploads = allow_uploads
         self.overwrite = overwrite
         self.allow_downloads = allow_downloads
+        self.weak_etags = weak_etags
+        self.stream_threshold = stream_threshold
+        self.cache = LRUCache(cache_max_bytes) if cache_max_bytes else None
+        self.cache_max_file_size = cache_max_file_size
+        self.revalidate_interval = revalidate_interval
+        self.negative_cache = LRUCache(max_bytes=negative_cache_size, max_entries=negative_cache_size) \
+            if negative_cache_size and negative_cache_ttl else None
+        self.negative_cache_ttl = negative_cache_ttl
+        self.precompressed = dict(precompressed) if precompressed else {}
+        self.sibling_cache = LRUCache(max_bytes=self.sibling_cache_size, max_entries=self.sibling_cache_size) \
+            if self.precompressed else None
+        self.listing_cache = LRUCache(listing_cache_max_bytes) if listing_cache_max_bytes else None
+        self.listing_page_size = listing_page_size
 
     def match(self, route: str) -> bool:
         if self.route and not route.startswith(self.route):
-            print("Doesn't match", route, self.route)
             return False
         added = route[len(self.route):]
         p = (self.path / added.strip("/")) if added else self.path
-        if not p.exists() and not self.allow_uploads:
+        if self.cache is not None and str(p) in self.cache:
+            return True
+        if self.allow_uploads:
+            return True
+        if self._known_missing(str(p)):
+            return False
+        if not p.exists():
+            self._remember_missing(str(p))
             return False
         return True
 
+    def _known_missing(self, key: str) -> bool:
+        if self.negative_cache is None:
+            return False
+        expires = self.negative_cache.get(key)
+        if expires is None:
+            return False
+        if monotonic() < expires:
+            return True
+        self.negative_cache.pop(key)
+        return False
+
+    def _remember_missing(self, key: str) -> None:
+        if self.negative_cache is not None:
+            self.negative_cache.set(key, monotonic() + self.negative_cache_ttl, 1)
+
     def _upload(self, request: Request):
         if request.method != "POST":
             raise HTTPStatusCodeResponses.METHOD_NOT_ALLOWED
@@ -446,7 +976,15 @@ class StaticFileHandler(MatchableHandlerABC):
 
         for file in request.files:
             if file.is_file:
-                file.save(self.path / file.filename)
+                p = self.path / file.filename
+                file.save(p)
+                if self.cache is not None:
+                    self.cache.pop(str(p))
+                self._update_listing(p)
+        if self.negative_cache is not None:
+            self.negative_cache.clear()
+        if self.sibling_cache is not None:
+            self.sibling_cache.clear()
         return Response(b"Uploaded", status_code=201, version=request.version)
 
     def __call__(self, request: Request) -> Response:
@@ -459,18 +997,222 @@ class StaticFileHandler(MatchableHandlerABC):
             raise HTTPStatusCodeResponses.FORBIDDEN
         added = route[len(self.route):]
         p = (self.path / added.strip("/")) if added else self.path
-
-        if p.is_dir() and (p / "index.html").exists():
-            p = p / "index.html"
-        if not p.exists():
-            return Response(b"Not Found", status_code=404, version=request.version)
-        elif p.is_dir():
-            folder_contents = list(p.iterdir())
-            contents = "<!DOCTYPE html><html><body><ul>" + "\n".join([f"<li><a href='{route}/{f.name}'>{f.name}</a></li>" for f in folder_contents]) + "</ul></body></html>"
-            return Response(contents.encode(), version=request.version)
-        r = FileResponse(p, version=request.version)
+        key = str(p)
+
+        range_header = request.headers.get("Range") if request.method == "GET" else None
+        cached = self._cached_file(key)
+        st = None
+        if cached is not None:
+            p = cached.path
+            mtime = cached.mtime
+        else:
+            if self._known_missing(key):
+                return Response(b"Not Found", status_code=404, version=request.version)
+            try:
+                st = p.stat()
+            except OSError:
+                self._remember_missing(key)
+                return Response(b"Not Found", status_code=404, version=request.version)
+            if S_ISDIR(st.st_mode):
+                try:
+                    st = (p / "index.html").stat()
+                    p = p / "index.html"
+                except OSError:
+                    return self._listing(request, route, key, p, st)
+            mtime = st.st_mtime
+
+        extra_headers = {}
+        if self.precompressed:
+            siblings = self._precompressed_siblings(key, p, mtime)
+            if siblings:
+                extra_headers["Vary"] = "Accept-Encoding"
+                encoding = None if range_header else self.negotiate_sibling(request.headers.get("Accept-Encoding"), siblings)
+                if encoding is not None:
+                    sibling = siblings[encoding]
+                    content_type = FileResponse.content_types.get(p.suffix[1:].lower(), FileResponse.content_types[None])
+                    # a direct request for the sibling caches it under its path, with its own Content-Type and no
+                    # Content-Encoding, so the negotiated variant needs a key of its own
+                    sibling_key = (str(sibling), encoding)
+                    return self._serve_file(request, sibling_key, sibling, cached=self._cached_file(sibling_key),
+                                            content_type=content_type, allow_ranges=False,
+                                            extra_headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+        return self._serve_file(request, key, p, st=st, cached=cached, range_header=range_header,
+                                extra_headers=extra_headers)
+
+    def _serve_file(self, request: Request, key, p: Path, st=None, cached: CachedFile = None,
+                    range_header: str = None, content_type: str = None, allow_ranges: bool = True,
+                    extra_headers: dict = None) -> Response:
+        """Answers a GET/HEAD for the file `p` (already known to exist), from the cache when possible."""
+        if cached is not None and not range_header:
+            if self.is_not_modified(request, cached.etag, cached.last_modified, cached.mtime):
+                return self._not_modified(request, cached.etag, cached.last_modified)
+            return cached.response(request.version)
+        if st is None:
+            try:
+                st = p.stat()
+            except OSError:
+                return Response(b"Not Found", status_code=404, version=request.version)
+
+        etag = FileResponse.etag(st, weak=self.weak_etags)
+        last_modified = FileResponse.http_date(st.st_mtime)
+        if self.is_not_modified(request, etag, last_modified, st.st_mtime):
+            return self._not_modified(request, etag, last_modified)
+        headers = {"ETag": etag, "Last-Modified": last_modified}
+        if allow_ranges:
+            headers["Accept-Ranges"] = "bytes"
+        if extra_headers:
+            headers.update(extra_headers)
+        if range_header and self.if_range_matches(request, etag, last_modified):
+            ranges = StreamedFileResponse.parse_range(range_header, st.st_size)
+            if ranges == []:
+                return Response(b"", status_code=416, headers={"Content-Range": f"bytes */{st.st_size}", **headers},
+                                version=request.version)
+            if ranges:
+                return StreamedFileResponse(p, ranges=ranges, stat_result=st, headers=headers, version=request.version)
+        if st.st_size >= self.stream_threshold:
+            return StreamedFileResponse(p, stat_result=st, content_type=content_type, headers=headers,
+                                        version=request.version)
+        if content_type is not None:
+            headers["Content-Type"] = content_type
+        if self.cache is not None and st.st_size <= self.cache_max_file_size:
+            body = p.read_bytes()
+            if len(body) == st.st_size:
+                cached = CachedFile(p, st, body, headers)
+                self.cache.set(key, cached, len(body) + len(cached.header_block))
+                return cached.response(request.version)
+        r = FileResponse(p, version=request.version, stat_result=st, headers=headers, content_type=content_type)
         return r
 
+    def _listing(self, request: Request, route: str, key: str, p: Path, st) -> Response:
+        listing = self.listing_cache.get(key) if self.listing_cache is not None else None
+        read = listing is None or listing.mtime_ns != st.st_mtime_ns
+        if read:
+            listing = DirectoryListing(p, st)
+        size = listing.size()
+        args = request.path.query_args()
+        sort = args.get("sort", "name")
+        if sort not in DirectoryListing.sort_keys:
+            sort = "name"
+        try:
+            page = max(int(args.get("page", 1)), 1)
+            per_page = min(max(int(args.get("per_page", self.listing_page_size)), 1), self.max_listing_page_size)
+        except ValueError:
+            return Response(b"Bad Request", status_code=400, version=request.version)
+        fmt = args.get("format")
+        if fmt is None:
+            fmt = "json" if request.headers.get("Accept", "").startswith("application/json") else "html"
+        body = listing.page(route, "json" if fmt == "json" else "html", sort, args.get("order") == "desc", page, per_page)
+        if self.listing_cache is not None and (read or listing.size() != size):
+            # only a new listing or a newly rendered page changes what the cache should hold
+            self.listing_cache.set(key, listing, listing.size())
+        content_type = "application/json" if fmt == "json" else "text/html"
+        return Response(body, headers={"Content-Type": content_type}, version=request.version)
+
+    def _update_listing(self, p: Path) -> None:
+        """Adds a just written file to its folder's cached listing, rather than making the next request re-read it."""
+        if self.listing_cache is None:
+            return
+        key = str(p.parent)
+        listing = self.listing_cache.get(key)
+        if listing is None:
+            return
+        try:
+            st = p.stat()
+            dir_st = p.parent.stat()
+        except OSError:
+            self.listing_cache.pop(key)
+            return
+        listing.add(p.name, st, dir_st)
+        self.listing_cache.set(key, listing, listing.size())
+
+    def _precompressed_siblings(self, key: str, p: Path, mtime: float) -> dict:
+        """{content coding: sibling path} for the precompressed versions of `p` which exist and aren't stale."""
+        entry = self.sibling_cache.get(key)
+        now = monotonic()
+        if entry is not None and now - entry[0] < self.revalidate_interval:
+            return entry[1]
+        siblings = {}
+        for encoding, suffix in self.precompressed.items():
+            sibling = p.with_name(p.name + suffix)
+            try:
+                if sibling.stat().st_mtime >= mtime:
+                    siblings[encoding] = sibling
+            except OSError:
+                pass
+        self.sibling_cache.set(key, (now, siblings), 1)
+        return siblings
+
+    @staticmethod
+    def negotiate_sibling(accept_encoding: str, siblings: dict):
+        """The content coding of the sibling the client prefers (ties go to the order of `precompressed`), if any."""
+        return choose_encoding(accept_encoding, siblings)
+
+    def _cached_file(self, key):
+        """The cached file for `key`, re-stat'ed first if it was last checked over `revalidate_interval` ago."""
+        if self.cache is None:
+            return None
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        now = monotonic()
+        if now - cached.checked_at < self.revalidate_interval:
+            return cached
+        try:
+            st = cached.path.stat()
+        except OSError:
+            self.cache.pop(key)
+            return None
+        if (st.st_ino, st.st_size, st.st_mtime_ns) != cached.stat_key:
+            self.cache.pop(key)
+            return None
+        cached.checked_at = now
+        return cached
+
+    @staticmethod
+    def _not_modified(request: Request, etag: str, last_modified: str) -> Response:
+        return Response(b"", status_code=304, headers={"ETag": etag, "Last-Modified": last_modified},
+                        version=request.version)
+
+    @staticmethod
+    def if_range_matches(request: Request, etag: str, last_modified: str) -> bool:
+        """Whether a Range request should be honoured given its If-Range, which must match strongly (RFC 9110 13.1.5)."""
+        if_range = request.headers.get("If-Range")
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            return not etag.startswith("W/") and if_range == etag
+        return if_range == last_modified
+
+    @staticmethod
+    def is_not_modified(request: Request, etag: str, last_modified: str, mtime: float) -> bool:
+        """Evaluates If-None-Match / If-Modified-Since (RFC 9110 13.2.2) for a GET or HEAD request."""
+        if request.method not in ("GET", "HEAD"):
+            return False
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            # If-None-Match takes precedence and uses the weak comparison
+            if if_none_match.strip() == "*":
+                return True
+            opaque = etag[2:] if etag.startswith("W/") else etag
+            for candidate in if_none_match.split(","):
+                candidate = candidate.strip()
+                if candidate.startswith("W/"):
+                    candidate = candidate[2:]
+                if candidate == opaque:
+                    return True
+            return False
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        if if_modified_since == last_modified:
+            return True
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError, OverflowError):
+            # an invalid date is ignored
+            return False
+
 
 class UploadFolder(StaticFileHandler):
     # TODO: add a very basic HTML landing page with upload button and drag and drop functionality
@@ -484,90 +1226,162 @@ class Workspace(StaticFileHandler):
 
 
 
-def matches_variadic_route(route: str, variadic_route: str) -> dict:
-    try:
-        if route.endswith("/") and not variadic_route.endswith("/"):
-            route = route[:-1]
-        elif variadic_route.endswith("/") and not route.endswith("/"):
-            variadic_route = variadic_route[:-1]
-        route_parts = route.split("/")
-        variadic_parts = variadic_route.split("/")
-        n = len(route_parts)
-        if n != len(variadic_parts):
-            return False
+def _route_int(value: str) -> int:
+    # stricter than int(), which would also take " 5", "5_000" and "+5"
+    if value.isdigit() or (value[:1] == "-" and value[1:].isdigit()):
+        return int(value)
+    raise ValueError(value)
 
-        found_matches = {}
-        identical_characters = 0
-        for i in range(n):
-            r = route_parts[i]
-            v = variadic_parts[i]
-            if r == v:
-                identical_characters += len(r)
-            else:
-                if not ('{' in v and '}' in v):
-                    return False
-                sections = []
-                current_section = {}
-                for c in v:
-                    if c == "{":
-                        if current_section.get("variadic", False):
-                            return False
-                        sections.append(current_section)
-                        current_section = {"variadic": True, "value": ""}
-                    elif c == "}":
-                        if not current_section.get("variadic", True):
-                            return False
-                        sections.append(current_section)
-                        current_section = {"variadic": False, "value": ""}
-                    else:
-                        if not current_section:
-                            current_section = {"variadic": False, "value": ""}
-                        current_section["value"] += c
-                sections.append(current_section)
-                sections = [s for s in sections if s]
-                sections = [s for s in sections if s["value"]]
-                if len(sections) == 1 and not sections[0]["variadic"]:
-                    found_matches[sections[0]["value"]] = r
+
+# converters for typed route segments like /items/{id:int}, which raise ValueError (or TypeError) if a value doesn't fit
+route_param_types = {
+    "int": _route_int,
+    "float": float,
+    "str": str,
+}
+
+
+def split_route_param(section: str) -> tuple:
+    """'id:int' -> ('id', 'int'), 'id' -> ('id', None)."""
+    name, _, type_name = section.partition(":")
+    return name, (type_name or None)
+
+
+def _tag_check(options):
+    """Compiles the options a handler was tagged with for a route parameter into a check on the captured string, or
+    None if anything goes: a list of values becomes a set membership test, a type a conversion attempt."""
+    if isinstance(options, (list, tuple, set, frozenset)):
+        if any(isinstance(o, type) and issubclass(str, o) for o in options):
+            return None
+        return frozenset(str(o) for o in options if not isinstance(o, type)).__contains__
+    if isinstance(options, type):
+        def check(value: str) -> bool:
+            try:
+                options(value)
+                return True
+            except Exception:
+                return False
+        return check
+    return None
+
+
+class VariadicRoute:
+    """A route pattern like /a/{b}/c.{d:int} compiled once, when it is registered, into a matcher.
+
+    Each segment is either a literal, compared with ==, or a list of (literal, parameter name) sections. Each parameter
+    gets its converter (from the `:type` suffix, see `route_param_types`) and the check compiled from the handler's tag
+    of the same name, so a route which doesn't fit fails as soon as one of them does.
+    """
+
+    def __init__(self, pattern: str, handler=None):
+        self.pattern = pattern
+        self.handler = handler
+        self.segments = [self._compile_segment(p) for p in self.split(pattern)]
+        self.converters = {}
+        self.checks = {}
+        tags = getattr(handler, "__dict__", {})
+        for segment in self.segments:
+            if isinstance(segment, str):
+                continue
+            for _, section in segment:
+                if section is None:
                     continue
-                # make sure they alternate
-                if not all([s["variadic"] != sections[i + 1]["variadic"] for i, s in enumerate(sections[:-1])]):
-                    raise ValueError("Variadic sections must alternate")
-
-                if any(s["value"] in found_matches and s["variadic"] for s in sections):
-                    raise ValueError("Variadic sections must be unique")
-
-                nonvariadic_start = 0
-                nonvariadic_end = 0
-                variadic_name = None
-                variables = {}
-                for section in sections:
-                    if section["variadic"]:
-                        variadic_name = section["value"]
-                        continue
-                    else:
-                        if section["value"] not in r[nonvariadic_end:]:
-                            return False
-                        identical_characters += len(section["value"])
-                        i = r[nonvariadic_end:].index(section["value"])
-                        nonvariadic_start = nonvariadic_end + i
-                        if variadic_name:
-                            variables[variadic_name] = r[nonvariadic_end:nonvariadic_start]
-
-                        nonvariadic_end = nonvariadic_start + len(section["value"])
-
-                        nv = r[nonvariadic_start:nonvariadic_end]
-                        if nv != section["value"]:
-                            raise ValueError(f"Expected {section['value']} but got {nv}")
-                        nonvariadic_start = nonvariadic_end
-                if sections[-1]["variadic"]:
-                    variables[variadic_name] = r[nonvariadic_end:]
-                elif nonvariadic_end < len(r):
-                    return False
-                found_matches.update(variables)
-
-
-        return found_matches
-    except Exception as e:
+                name, type_name = split_route_param(section)
+                if name in self.converters or name in self.checks:
+                    raise ValueError(f"Route parameter {{{name}}} appears twice in {pattern}")
+                if type_name is not None:
+                    if type_name not in route_param_types:
+                        raise ValueError(f"Unknown type {type_name!r} for route parameter {{{name}}} in {pattern}, "
+                                         f"expected one of {list(route_param_types)}")
+                    self.converters[name] = route_param_types[type_name]
+                check = _tag_check(tags[name]) if name in tags else None
+                if check is not None:
+                    self.checks[name] = check
+
+    @staticmethod
+    def split(route: str) -> list:
+        # a trailing slash is optional
+        if route.endswith("/"):
+            route = route[:-1]
+        return route.split("/")
+
+    @staticmethod
+    def _compile_segment(segment: str):
+        """A literal segment as is, a variadic one as [(literal before it, parameter), ..., (trailing literal, None)]."""
+        if "{" not in segment or "}" not in segment:
+            return segment
+        sections = []
+        rest = segment
+        while "{" in rest:
+            literal, _, rest = rest.partition("{")
+            param, closed, rest = rest.partition("}")
+            if not closed or not param or "{" in param:
+                raise ValueError(f"Invalid route segment {segment!r}")
+            if sections and not literal:
+                raise ValueError(f"Route parameters in {segment!r} must be separated by some text")
+            sections.append((literal, param))
+        if "}" in rest:
+            raise ValueError(f"Invalid route segment {segment!r}")
+        sections.append((rest, None))
+        return sections
+
+    def match(self, route: str):
+        return self.match_parts(self.split(route))
+
+    def match_parts(self, parts: list):
+        """The route parameters (converted) if the split route fits this pattern, otherwise None."""
+        segments = self.segments
+        if len(parts) != len(segments):
+            return None
+        captured = {}
+        for part, segment in zip(parts, segments):
+            if segment.__class__ is str:
+                if part != segment:
+                    return None
+                continue
+            pos = 0
+            pending = None
+            for literal, param in segment:
+                if pending is None:
+                    if not part.startswith(literal, pos):
+                        return None
+                    i = pos
+                elif literal:
+                    i = part.find(literal, pos)
+                    if i < 0:
+                        return None
+                else:
+                    i = len(part)
+                if pending is not None:
+                    captured[pending] = part[pos:i]
+                pos = i + len(literal)
+                pending = param
+            if pos != len(part):
+                return None
+
+        params = {}
+        for section, value in captured.items():
+            name, _ = split_route_param(section)
+            check = self.checks.get(name)
+            if check is not None and not check(value):
+                return None
+            converter = self.converters.get(name)
+            if converter is not None:
+                try:
+                    value = converter(value)
+                except (ValueError, TypeError):
+                    return None
+            params[name] = value
+        return params
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.pattern}>"
+
+
+def matches_variadic_route(route: str, variadic_route: str) -> dict:
+    try:
+        return VariadicRoute(variadic_route).match(route) or False
+    except ValueError:
         return False
 
 
@@ -615,6 +1429,16 @@ class RouteHandler:
     resources_folder = Path(__file__).parent / "resources"
     playground_folder = resources_folder / "playground"
     default_favicon = resources_folder / "favicon.ico"
+    # bumped whenever a route is added to any RouteHandler, invalidating every cached schema and nav page
+    routes_version = 0
+    nav_cache_size = 64
+    # where routes tagged @cached keep their responses, one budget for every RouteHandler unless replaced
+    response_cache = response_cache
+    # shared by every RouteHandler, so each is read from disk at most once per process
+    swagger_asset = StaticAsset(resources_folder / "swagger.html")
+    playground_asset = StaticAsset(playground_folder / "playground.html")
+    playground_js_asset = StaticAsset(playground_folder / "playground.js")
+    playground_panels_js_asset = StaticAsset(playground_folder / "panels.js")
 
     def __init__(self,
                  routes: dict = None,
@@ -633,13 +1457,17 @@ class RouteHandler:
         self.require_tag = require_tag
         self.error_mode = error_mode
         self.favicon_path = favicon
+        self.favicon_asset = StaticAsset(favicon) if favicon else None
 
         self.routes = {}
         self.matchable_routes = {}
         self.variadic_routes = {}
+        self._variadic_matchers = []
         self.sub_route_handlers = {}
         self.nav_path = nav_path
         self.nav_recursion = nav_recursion
+        self._openapi_cache = None
+        self._nav_cache = LRUCache(max_bytes=self.nav_cache_size, max_entries=self.nav_cache_size)
         if routes:
             if isinstance(routes, type):
                 routes = routes()
@@ -699,6 +1527,7 @@ class RouteHandler:
         if sub in self.sub_route_handlers:
             raise NotImplementedError(f"Route {sub} already exists. Duplicate routes are not allowed.")
         self.sub_route_handlers[sub] = handler
+        RouteHandler.routes_version += 1
 
     def _all_routes(self, recursive=True):
         d = {
@@ -710,35 +1539,40 @@ class RouteHandler:
                 d.update(v._all_routes(recursive))
         return d
     @get
-    def openapi(self) -> str:
-        from socketwrench.openapi import openapi_schema
-        d = self._all_routes()
-        o = openapi_schema(d)
-        return o
+    def openapi(self, request: Request) -> Response:
+        """The OpenAPI schema, generated once per routes_version and sent as pre-serialized bytes."""
+        cached = self._openapi_cache
+        if cached is None or cached[0] != RouteHandler.routes_version:
+            from socketwrench.openapi import openapi_schema
+            version = RouteHandler.routes_version
+            o = openapi_schema(self._all_routes())
+            cached = self._openapi_cache = (version, StaticAsset(content_type="application/json",
+                                                                 body=JSONResponse.encode(o)))
+        return cached[1](request)
 
     @get
     def favicon(self, request: Request) -> Response:
         try:
-            r = FileResponse(self.favicon_path, version=request.version)
+            r = self.favicon_asset(request)
         except Exception as e:
             r = Response(b"Not Found", status_code=404, version=request.version)
         return r
 
     @get
-    def swagger(self) -> FileResponse:
-        return FileResponse(self.resources_folder / "swagger.html")
+    def swagger(self, request: Request) -> Response:
+        return self.swagger_asset(request)
 
     @get
-    def playground(self) -> Path:
-        return self.playground_folder / "playground.html"
+    def playground(self, request: Request) -> Response:
+        return self.playground_asset(request)
 
     @get
-    def playground_js(self) -> Path:
-        return self.playground_folder /  "playground.js"
+    def playground_js(self, request: Request) -> Response:
+        return self.playground_js_asset(request)
 
     @get
-    def playground_panels_js(self) -> Path:
-        return self.playground_folder / "panels.js"
+    def playground_panels_js(self, request: Request) -> Response:
+        return self.playground_panels_js_asset(request)
 
     def parse_routes_from_object(self, obj):
         for k in dir(obj):
@@ -755,7 +1589,17 @@ class RouteHandler:
         if callable(obj):
             self[""] = obj
 
-    def get_nav(self, start=""):
+    def get_nav(self, start="", request: Request = None) -> Response:
+        """The navigation page for routes under `start`, rendered once per routes_version."""
+        cached = self._nav_cache.get(start)
+        if cached is None or cached[0] != RouteHandler.routes_version:
+            version = RouteHandler.routes_version
+            r = self._render_nav(start)
+            cached = (version, StaticAsset(content_type=r.headers["Content-Type"], body=bytes(r.body)))
+            self._nav_cache.set(start, cached, 1)
+        return cached[1](request)
+
+    def _render_nav(self, start=""):
         routes = self._all_routes(self.nav_recursion)
         links = []
         for route in routes:
@@ -838,6 +1682,7 @@ class RouteHandler:
                             version=request.version)
 
         route_params = {}
+        registered_route = route
         if route in self.default_routes:
             handler = self.default_routes[route]
         elif route in self.routes:
@@ -852,6 +1697,7 @@ class RouteHandler:
             for k, v in self.matchable_routes.items():
                 if v.match(route):
                     handler = v
+                    registered_route = k
                     break
                 logger.debug(f"Route {route} doesn't match any handlers")
             else:
@@ -859,54 +1705,20 @@ class RouteHandler:
                 if "{" in x and x in self.variadic_routes:
                     # raise ValueError(f"Route {route} is variadic, {{}} patterns should be filled in")
                     return ErrorResponse(f"Route {x} is variadic, {{}} patterns should be filled in".encode(), version=request.version)
-                # check all variadic routes in the correct order, first by number of parts, then number of variadic parts, then length of nonvariadic parts
-                variadic_patterns = sort_variadic_routes(list(self.variadic_routes.keys()))
-
-                for k in variadic_patterns:
-                    # these are in format /a/{b}/c/{d}/e, convert to regexp groups
-                    route_params = matches_variadic_route(route, k)
-                    if route_params:
-                        handler = self.variadic_routes[k]
-                        for _k, _v in route_params.items():
-                            if hasattr(handler, "__dict__") and _k in handler.__dict__:
-                                options = handler.__dict__[_k]
-                                if _v == options:
-                                    # good! matches exactly
-                                    continue
-                                elif isinstance(options, (list, tuple, set, frozenset)):
-                                    for o in options:
-                                        if str(o) == _v:
-                                            # good! matches exactly one of the options
-                                            break
-                                        try:
-                                            if isinstance(o, type):
-                                                if isinstance(_v, o):
-                                                    # good! matches the type of one of the options
-                                                    break
-                                        except:
-                                            pass
-                                    else:
-                                        # oops! didn't match any of the options
-                                        break
-                                    continue
-                                elif isinstance(options, type):
-                                    try:
-                                        options(_v)
-                                        continue
-                                    except:
-                                        # oops! didn't match the type
-                                        break
-                                else:
-                                    # unable to interpret the options, maybe raise an error?
-                                    continue
-                        else:
-                            # this means the route_params matched all the options, which means we found the right handler
-                            break
+                # the patterns were sorted when they were added, most specific first
+                parts = VariadicRoute.split(route)
+                for matcher in self._variadic_matchers:
+                    route_params = matcher.match_parts(parts)
+                    if route_params is not None:
+                        handler = matcher.handler
+                        registered_route = matcher.pattern
+                        break
                 else:
+                    route_params = {}
                     handler = self.fallback_handler
 
         if handler is None and route.endswith(self.nav_path):
-            return self.get_nav(route[:-len(self.nav_path)])
+            return self.get_nav(route[:-len(self.nav_path)], request)
 
         if handler is None:
             # send a response with 404
@@ -922,6 +1734,11 @@ class RouteHandler:
                             status_code=405,
                             headers={"Content-Type": "text/plain"},
                             version=request.version)
+        cache_options = gettag(handler, "cached", None)
+        if cache_options is not None and request.method in ("GET", "HEAD"):
+            # answered from the cache before any argument is parsed
+            return self.response_cache.respond(request, handler, registered_route, cache_options,
+                                               lambda: handler(request, route_params) if route_params else handler(request))
         if route_params:
             r = handler(request, route_params)
         else:
@@ -949,8 +1766,15 @@ class RouteHandler:
 
         sub = self.base_path + route
         sub = sub.replace("//", "/")
+        if gettag(h, "constant", False):
+            h = constant_handler(h, sub)
+        RouteHandler.routes_version += 1
         if "{" in route and "}" in route:
+            matcher = VariadicRoute(sub, h)
             self.variadic_routes[sub] = h
+            matchers = {m.pattern: m for m in self._variadic_matchers}
+            matchers[sub] = matcher
+            self._variadic_matchers = [matchers[k] for k in sort_variadic_routes(list(matchers))]
         elif hasattr(h, "match") and callable(h.match):
             self.matchable_routes[sub] = h
         else:
@@ -971,6 +1795,9 @@ class RouteHandler:
     def delete(self, handler=None, route: str = None):
         return self.route(handler, route, allowed_methods=("DELETE",))
 
+    def websocket(self, handler=None, route: str = None):
+        return self.route(tag(handler, websocket=gettag(handler, "websocket", {})), route, allowed_methods=("GET",))
+
     def head(self, handler=None, route: str = None):
         route = route or handler.__name__
 
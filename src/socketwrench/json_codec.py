@@ -0,0 +1,83 @@
+"""The JSON codec socketwrench parses (and serializes) JSON with.
+
+orjson is used if it is installed, otherwise the json module from standardlib_dependencies (the standard library, or
+ujson / fake_json where that is missing). Swap it with `set_json_codec`.
+"""
+from socketwrench.settings import raise_import_error_if_testing
+from socketwrench.standardlib_dependencies import dumps, loads
+
+# orjson is a third party package, so it is optional even with the full standard library
+try:
+    raise_import_error_if_testing('orjson')
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONCodec:
+    """A named pair of functions: `loads(bytes | str) -> object` and `dumps(object) -> bytes`."""
+
+    def __init__(self, name: str, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.name}>"
+
+
+def _json_loads(data):
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if not isinstance(data, str):
+        data = data.decode()
+    return loads(data)
+
+
+# compact output, without the spaces json.dumps puts after "," and ":" by default (ujson is compact already)
+try:
+    dumps({}, separators=(",", ":"))
+    _compact = {"separators": (",", ":")}
+except TypeError:
+    _compact = {}
+
+
+def _json_dumps(obj) -> bytes:
+    return dumps(obj, **_compact).encode()
+
+
+def _orjson_loads(data):
+    if isinstance(data, bytes) and type(data) is not bytes:
+        # orjson only takes exact bytes, and a memoryview avoids copying a RequestBody
+        data = memoryview(data)
+    return orjson.loads(data)
+
+
+# dict keys which aren't strings are converted, as json does
+_orjson_options = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def _orjson_dumps(obj) -> bytes:
+    try:
+        return orjson.dumps(obj, option=_orjson_options)
+    except TypeError:
+        # e.g. integers past 64 bits, which json handles
+        return _json_dumps(obj)
+
+
+json_codec = JSONCodec("json", _json_loads, _json_dumps)
+orjson_codec = JSONCodec("orjson", _orjson_loads, _orjson_dumps) if orjson is not None else None
+
+codec = orjson_codec or json_codec
+
+
+def set_json_codec(new_codec: JSONCodec = None) -> JSONCodec:
+    """Makes socketwrench use `new_codec` (None for the default) and returns the previous one."""
+    global codec
+    previous = codec
+    codec = new_codec or orjson_codec or json_codec
+    return previous
+
+
+def get_json_codec() -> JSONCodec:
+    return codec
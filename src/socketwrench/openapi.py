@@ -6,6 +6,26 @@ from socketwrench.standardlib_dependencies import (
 from socketwrench import FileResponse, Response
 from socketwrench.tags import gettag
 
+# OpenAPI schema types of the typed route segments, e.g. /items/{id:int}
+_path_param_schemas = {
+    "int": {"type": "integer"},
+    "float": {"type": "number"},
+}
+
+
+def path_params(route_name: str) -> tuple:
+    """The route as OpenAPI writes it (/items/{id}) and {name: type name or None} for its parameters."""
+    params = {}
+    path = ""
+    rest = route_name
+    while "{" in rest and "}" in rest:
+        before, _, rest = rest.partition("{")
+        section, _, rest = rest.partition("}")
+        name, _, type_name = section.partition(":")
+        params[name] = type_name or None
+        path += before + "{" + name + "}"
+    return path + rest, params
+
 
 def openapi_schema(routes_dict):
     openapi = {
@@ -19,6 +39,7 @@ def openapi_schema(routes_dict):
 
 
     for route_name, func in routes_dict.items():
+        route_name, route_params = path_params(route_name)
         route_info = getattr(func, "openapi", {}) or {}
         docstring = func.__doc__
         if "summary" not in route_info:
@@ -33,9 +54,9 @@ def openapi_schema(routes_dict):
                     continue
                 param_info = {
                     "name": name,
-                    "in": "path" if f"{{{name}}}" in route_name else "query",
-                    "required": param.default == param.empty or f"{{{name}}}" in route_name,
-                    "schema": {"type": "string"}
+                    "in": "path" if name in route_params else "query",
+                    "required": param.default == param.empty or name in route_params,
+                    "schema": dict(_path_param_schemas.get(route_params.get(name), {"type": "string"}))
                 }
                 parameters.append(param_info)
 
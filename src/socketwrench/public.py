@@ -1,5 +1,9 @@
 from .server import Server
-from .handlers import RouteHandler, StaticFileHandler, MatchableHandlerABC, UploadFolder, Workspace
+from .handlers import RouteHandler, StaticFileHandler, MatchableHandlerABC, UploadFolder, Workspace, route_param_types
+from .websockets import WebSocket, WebSocketClosed
+from .compress import ResponseCompressor
+from .response_cache import ResponseCache, invalidate_cache
+from .json_codec import JSONCodec, set_json_codec, get_json_codec
 from .types import (
     Request,
     Response,
@@ -12,6 +16,13 @@ from .types import (
     RedirectResponse,
     TemporaryRedirect,
     PermanentRedirect,
+    SSEResponse,
+    SSEEvent,
+    WebSocketResponse,
+    StreamedResponse,
+    StreamedFileResponse,
+    StreamedZipResponse,
+    FileSlice,
     RequestBody,
     Query,
     Body,
@@ -41,7 +52,14 @@ from .tags import (
     post,
     put,
     patch,
-    delete
+    delete,
+    sse,
+    batched,
+    coalesced,
+    cached,
+    constant,
+    no_compression,
+    websocket
 )
 from .settings import disable_autofill
 
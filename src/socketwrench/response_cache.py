@@ -0,0 +1,182 @@
+from socketwrench.standardlib_dependencies import logging, Lock, Thread, monotonic
+from socketwrench.cache import LRUCache
+from socketwrench.types import Request, Response, PrebuiltResponse, StreamedResponse
+
+logger = logging.getLogger("socketwrench")
+
+
+class ResponseCache:
+    """The responses of routes tagged `@cached`, kept fully serialized so a hit runs neither the argument parsing nor the
+    handler. Entries are keyed by the handler, path, query and the request headers named in the tag's `vary`, expire
+    `ttl` seconds after they were made, and share one byte budget with least-recently-used eviction.
+
+    Only complete 200 responses to GET/HEAD are stored, and not those which set cookies or say `no-store`/`private`.
+    Compressed copies made by the ResponseCompressor live with their entry, outside the budget.
+
+    Stale-while-revalidate: for `stale` seconds after an entry stops being fresh it is still sent, and the first such
+    request starts the one background call which replaces it. Entries of `hot` routes are refreshed the same way while
+    still fresh, once they are in the last `refresh_ahead` of their ttl, so requests to them never wait. Background
+    calls run on `executor` (the Server sets its thread pool) or otherwise on a thread of their own.
+    """
+    default_max_bytes: int = 64 * 1024 * 1024
+    # hot entries are refreshed once this fraction of their ttl is left
+    refresh_ahead: float = 0.2
+
+    def __init__(self, max_bytes: int = default_max_bytes, executor=None):
+        self.entries = LRUCache(max_bytes=max_bytes)
+        self.executor = executor
+        # {route: [hits, misses, stale hits, refreshes]}, by the route as registered, e.g. /items/{id}
+        self.route_stats = {}
+        self._lock = Lock() if Lock is not None else None
+        # keys being recomputed in the background, so each is only recomputed once at a time
+        self._refreshing = set()
+
+    @staticmethod
+    def key(handler, route: str, request: Request, vary: tuple) -> tuple:
+        path = request.path
+        query = path.query_args()
+        return (handler,
+                route,
+                path.route(),
+                tuple(sorted(query.items())) if query else (),
+                tuple(request.headers.get(h) for h in vary) if vary else ())
+
+    def respond(self, request: Request, handler, route: str, options: dict, call) -> Response:
+        """The cached response for this request to `handler` (registered as `route`), or the result of `call()`,
+        which is stored if it can be."""
+        key = self.key(handler, route, request, options["vary"])
+        entry = self.entries.get(key)
+        now = monotonic()
+        if entry is not None:
+            response, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self._count(route, 0)
+                if options.get("hot") and now >= fresh_until - options["ttl"] * self.refresh_ahead:
+                    self._refresh(key, route, options, call)
+                return response.for_version(request.version)
+            if now < stale_until and self._refresh(key, route, options, call):
+                self._count(route, 2)
+                return response.for_version(request.version)
+        self._count(route, 1)
+        return self._store(key, options, call())
+
+    def _store(self, key: tuple, options: dict, response: Response) -> Response:
+        prebuilt = self.prebuild(response)
+        if prebuilt is None:
+            return response
+        fresh_until = monotonic() + options["ttl"]
+        self.entries.set(key, (prebuilt, fresh_until, fresh_until + options.get("stale", 0)),
+                         size=len(prebuilt.header_block) + len(prebuilt.body))
+        return prebuilt
+
+    def _refresh(self, key: tuple, route: str, options: dict, call) -> bool:
+        """Starts recomputing `key` in the background unless that is already happening. Returns False if it can't be
+        done in the background at all, in which case the caller should recompute it itself."""
+        self._acquire()
+        try:
+            if key in self._refreshing:
+                return True
+            self._refreshing.add(key)
+        finally:
+            self._release()
+
+        def revalidate():
+            try:
+                self._count(route, 3)
+                self._store(key, options, call())
+            except Exception as e:
+                # the old entry stays until it is no longer usable
+                logger.exception(e)
+            finally:
+                self._acquire()
+                self._refreshing.discard(key)
+                self._release()
+
+        if self.executor is not None:
+            try:
+                self.executor.submit(revalidate)
+                return True
+            except RuntimeError:
+                # the executor has been shut down
+                pass
+        if Thread is not None:
+            Thread(target=revalidate, daemon=True).start()
+            return True
+        self._acquire()
+        self._refreshing.discard(key)
+        self._release()
+        return False
+
+    @staticmethod
+    def prebuild(response: Response):
+        """A PrebuiltResponse equal to `response`, or None if it shouldn't be cached."""
+        if isinstance(response, StreamedResponse) or response.status_code != 200 or response.headers is None:
+            return None
+        if response.__class__ is PrebuiltResponse:
+            return response
+        headers = response.headers
+        if "Set-Cookie" in headers:
+            return None
+        cache_control = str(headers.get("Cache-Control", "")).lower()
+        if "no-store" in cache_control or "private" in cache_control:
+            return None
+        return PrebuiltResponse.from_response(response)
+
+    def _acquire(self):
+        if self._lock is not None:
+            self._lock.acquire()
+
+    def _release(self):
+        if self._lock is not None:
+            self._lock.release()
+
+    def _count(self, route: str, i: int):
+        self._acquire()
+        try:
+            counts = self.route_stats.get(route)
+            if counts is None:
+                counts = self.route_stats[route] = [0, 0, 0, 0]
+            counts[i] += 1
+        finally:
+            self._release()
+
+    def invalidate(self, route: str = None, prefix: bool = False) -> int:
+        """Drops the entries for `route` (a path like /items/3, or a route as registered like /items/{id}), for every
+        route starting with it if `prefix`, or everything if it is None. Returns how many entries were dropped."""
+        if route is None:
+            n = len(self.entries)
+            self.entries.clear()
+            return n
+        n = 0
+        for key in self.entries.keys():
+            if prefix:
+                matches = key[1].startswith(route) or key[2].startswith(route)
+            else:
+                matches = key[1] == route or key[2] == route
+            if matches and self.entries.pop(key) is not None:
+                n += 1
+        return n
+
+    def stats(self) -> dict:
+        return {
+            **self.entries.stats(),
+            "routes": {route: {"hits": hits, "misses": misses, "stale_hits": stale_hits, "refreshes": refreshes}
+                       for route, (hits, misses, stale_hits, refreshes) in self.route_stats.items()},
+        }
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.entries!r}>"
+
+
+# shared by every RouteHandler, so the byte budget is global
+response_cache = ResponseCache()
+
+
+def invalidate_cache(route: str = None, prefix: bool = False, cache: ResponseCache = None) -> int:
+    """Drops cached responses, see `ResponseCache.invalidate`. `cache` defaults to the one RouteHandlers are serving
+    from, `RouteHandler.response_cache`, which may have been replaced since this module made the first one."""
+    if cache is None:
+        # imported here, since handlers imports this module
+        import socketwrench.handlers as handlers
+        cache = handlers.RouteHandler.response_cache
+    return cache.invalidate(route, prefix=prefix)
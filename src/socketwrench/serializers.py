@@ -0,0 +1,108 @@
+"""Compiles dataclass types into functions which turn instances into plain JSON-ready values.
+
+`dataclasses.asdict` walks every value it meets, deep-copying as it goes, and looks the fields up again for every
+instance. A compiled serializer is generated once per type from its fields and type hints: fields typed as plain JSON
+values are read straight off the instance, and only fields which can hold dataclasses are converted further.
+"""
+from socketwrench.standardlib_dependencies import dataclasses
+
+_plain_types = (str, int, float, bool, type(None))
+_serializers = {}
+_compiling = set()
+
+
+def to_plain(value):
+    """Converts dataclass instances anywhere inside `value` to dicts, for values whose type isn't known up front.
+    Unlike a compiled serializer this trusts no annotations, so it is also the fallback when one turns out wrong."""
+    if dataclasses and dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {f.name: to_plain(getattr(value, f.name)) for f in dataclasses.fields(value)}
+    if isinstance(value, (list, tuple)):
+        return type(value)(to_plain(v) for v in value) if type(value) in (list, tuple) else [to_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {to_plain(k): to_plain(v) for k, v in value.items()}
+    return value
+
+
+def _type_hints(cls) -> dict:
+    try:
+        from typing import get_type_hints
+        return get_type_hints(cls)
+    except Exception:
+        return {}
+
+
+def converter_for(typehint):
+    """A function converting values of `typehint` to plain values, or None if they are plain already."""
+    if typehint in _plain_types:
+        return None
+    if dataclasses and isinstance(typehint, type) and dataclasses.is_dataclass(typehint):
+        return _nested_serializer(typehint)
+    origin = getattr(typehint, "__origin__", None)
+    args = getattr(typehint, "__args__", ()) or ()
+    if origin in (list, set, frozenset) and len(args) == 1:
+        item = converter_for(args[0])
+        if item is None:
+            return None if origin is list else list
+        return lambda v: [item(x) for x in v]
+    if origin is tuple and args:
+        items = [converter_for(a) for a in args if a is not Ellipsis]
+        if all(c is None for c in items):
+            return None
+        if len(args) == 2 and args[1] is Ellipsis:
+            item = items[0]
+            return lambda v: [item(x) for x in v]
+        return to_plain
+    if origin is dict and len(args) == 2:
+        if args[0] in _plain_types:
+            value = converter_for(args[1])
+            if value is None:
+                return None
+            return lambda v: {k: value(x) for k, x in v.items()}
+        return to_plain
+    if args and type(None) in args:
+        # Optional[X]
+        rest = [a for a in args if a is not type(None)]
+        if len(rest) == 1:
+            inner = converter_for(rest[0])
+            if inner is None:
+                return None
+            return lambda v: None if v is None else inner(v)
+        if all(a in _plain_types for a in rest):
+            return None
+    # Any, unions, unannotated fields and anything else could hold a dataclass, so look at the value itself
+    return to_plain
+
+
+def _nested_serializer(cls):
+    """The serializer for a field typed as the dataclass `cls`. Fields often hold something else all the same (None
+    for `price: Price = None`, or a subclass with more fields), which go through `to_plain` instead."""
+    if cls in _compiling:
+        # a dataclass which refers to itself (trees, linked lists) is looked up once it has compiled
+        return lambda v: _serializers[cls](v) if v.__class__ is cls else to_plain(v)
+    serialize = compile_serializer(cls)
+    return lambda v: serialize(v) if v.__class__ is cls else to_plain(v)
+
+
+def compile_serializer(cls):
+    """The function turning instances of the dataclass `cls` into dicts, generated on first use and kept."""
+    serializer = _serializers.get(cls)
+    if serializer is not None:
+        return serializer
+    hints = _type_hints(cls)
+    namespace = {}
+    items = []
+    _compiling.add(cls)
+    try:
+        for i, field in enumerate(dataclasses.fields(cls)):
+            convert = converter_for(hints.get(field.name, field.type))
+            if convert is None:
+                items.append(f"{field.name!r}: o.{field.name}")
+            else:
+                namespace[f"c{i}"] = convert
+                items.append(f"{field.name!r}: c{i}(o.{field.name})")
+    finally:
+        _compiling.discard(cls)
+    source = f"def serialize(o):\n    return {{{', '.join(items)}}}\n"
+    exec(source, namespace)
+    serializer = _serializers[cls] = namespace["serialize"]
+    return serializer
@@ -7,7 +7,8 @@ from socketwrench.standardlib_dependencies import (
     threading_available
 )
 
-from socketwrench.connection import Connection
+from socketwrench.connection import Connection, EventStreamPump, BufferPool
+from socketwrench.compress import ResponseCompressor
 from socketwrench.handlers import RouteHandler, wrap_handler, is_object_instance
 
 logger = logging.getLogger("socketwrench")
@@ -28,6 +29,9 @@ class Server(socket.socket):
     default_pause_sleep = 0.1
     default_accept_sleep = 0
     default_favicon = RouteHandler.default_favicon
+    default_keep_alive_timeout = Connection.default_keep_alive_timeout
+    default_buffer_size = BufferPool.default_buffer_size
+    default_max_pooled_buffers = BufferPool.default_max_buffers
 
     def __init__(self,
                  routes: dict = None,
@@ -45,6 +49,11 @@ class Server(socket.socket):
                  protocol: str = "http",
                  secured: bool = False,
                  origin: str = None,
+                 keep_alive_timeout: float = default_keep_alive_timeout,
+                 concurrent_pipelining: bool = False,
+                 buffer_size: int = default_buffer_size,
+                 max_pooled_buffers: int = default_max_pooled_buffers,
+                 compression=True,
                  **kwargs
                  ):
         """A simple HTTP server built directly on top of socket.socket.
@@ -69,6 +78,17 @@ class Server(socket.socket):
             protocol (str, optional): The protocol to use for the server in logging statements. Defaults to "http".
             secured (bool, optional): Whether the server is secured. Defaults to False. Only used for logging full url.
             origin (str, optional): The full URL to use for the server in logging statements, otherwise we guess. Defaults to None.
+            keep_alive_timeout (float, optional): How long a connection waits for another request after answering
+                everything it has received. Pipelined requests are always answered. Defaults to 0 (no idle wait).
+            concurrent_pipelining (bool, optional): Whether pipelined requests on one connection are handled concurrently
+                on the thread pool (responses are still written in order). Only used with thread=True. Defaults to False.
+            buffer_size (int, optional): The size of the pooled receive and response scratch buffers connections check
+                out. Requests bigger than this still work, they just get a private buffer. Defaults to 16 KiB.
+            max_pooled_buffers (int, optional): How many idle buffers the pool keeps for reuse. Defaults to 256.
+                Hit/miss counts are available from `server.buffer_pool.stats()`.
+            compression (bool | ResponseCompressor, optional): Whether to compress responses for clients sending
+                Accept-Encoding (zstd on python 3.14+, gzip, deflate). Pass a ResponseCompressor to set the minimum size,
+                level or content types. Tag a route with @no_compression to opt it out. Defaults to True.
         """
         if socket_options == "default":
             socket_options = self.default_socket_options
@@ -113,11 +133,18 @@ class Server(socket.socket):
         self.num_connection_threads = num_connection_threads
         self.pause_sleep = pause_sleep
         self.accept_sleep = accept_sleep
+        self.keep_alive_timeout = keep_alive_timeout
+        self.concurrent_pipelining = concurrent_pipelining
         self.init_socket_options = socket_options
         self.thread_pool_executor = None
         self.server_thread = None
         self.cleanup_event = None
         self.pause_event = None
+        self.event_stream_pump = EventStreamPump() if threading_available else None
+        self.buffer_pool = BufferPool(buffer_size=buffer_size, max_buffers=max_pooled_buffers)
+        if compression is True:
+            compression = ResponseCompressor()
+        self.compressor = compression or None
 
         self._rep = None
 
@@ -163,6 +190,9 @@ class Server(socket.socket):
                 from concurrent.futures import ThreadPoolExecutor
                 self.thread_pool_executor = ThreadPoolExecutor(max_workers=self.num_connection_threads)
                 logger.info(f"Using ThreadPoolExecutor with max_workers={self.num_connection_threads}.")
+                if isinstance(self.handler, RouteHandler):
+                    # stale cached responses are recomputed on the same pool
+                    self.handler.response_cache.executor = self.thread_pool_executor
             else:
                 raise RuntimeError("Threading is not available on this platform.")
 
@@ -174,7 +204,7 @@ class Server(socket.socket):
                 self.pause_event = Event()
 
                 logger.info("Starting server in background thread. Make sure to keep the main thread alive.")
-                t = Thread(target=self.serve, args=(False, self.cleanup_event, self.pause_event), daemon=True)
+                t = Thread(target=self.serve, kwargs={"cleanup_event": self.cleanup_event, "pause_event": self.pause_event}, daemon=True)
                 t.start()
                 self.server_thread = t
                 return t, self.cleanup_event, self.pause_event
@@ -182,6 +212,11 @@ class Server(socket.socket):
                 raise RuntimeError("Threading is not available on this platform.")
 
 
+        if cleanup_event is not None:
+            self.cleanup_event = cleanup_event
+            if self.event_stream_pump is not None:
+                self.event_stream_pump.cleanup_event = cleanup_event
+
         self.bind((self.host, self.port))
         self.listen(self.backlog)
         self.settimeout(1) # timeout for accept, allows Keyboard Interrupt to shutdown the server
@@ -218,7 +253,12 @@ class Server(socket.socket):
         connection = Connection(self.handler, client_connection, client_address,
                                 cleanup_event=self.cleanup_event,
                                 chunk_size=self.chunk_size,
-                                origin=self.origin)
+                                origin=self.origin,
+                                event_stream_pump=self.event_stream_pump,
+                                keep_alive_timeout=self.keep_alive_timeout,
+                                executor=self.thread_pool_executor if self.concurrent_pipelining else None,
+                                buffer_pool=self.buffer_pool,
+                                compressor=self.compressor)
         return connection
 
     def close(self) -> None:
@@ -226,6 +266,8 @@ class Server(socket.socket):
         if self.server_thread:
             self.cleanup_event.set()
             self.server_thread.join()
+        if self.event_stream_pump is not None:
+            self.event_stream_pump.close()
         super().close()
 
     def __repr__(self) -> str:
@@ -247,6 +289,14 @@ class Server(socket.socket):
                 r += f"pause_sleep={self.pause_sleep}, "
             if self.accept_sleep != self.default_accept_sleep:
                 r += f"accept_sleep={self.accept_sleep}, "
+            if self.keep_alive_timeout != self.default_keep_alive_timeout:
+                r += f"keep_alive_timeout={self.keep_alive_timeout}, "
+            if self.buffer_pool.buffer_size != self.default_buffer_size:
+                r += f"buffer_size={self.buffer_pool.buffer_size}, "
+            if self.buffer_pool.max_buffers != self.default_max_pooled_buffers:
+                r += f"max_pooled_buffers={self.buffer_pool.max_buffers}, "
+            if self.compressor is None:
+                r += "compression=False, "
             r = r.rstrip(", ")
             r += ")>"
             self._rep = r
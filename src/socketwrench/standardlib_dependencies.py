@@ -13,18 +13,25 @@ try:
     import inspect
     from sys import argv
     from argparse import ArgumentParser
-    from tempfile import TemporaryFile
-    from zipfile import ZipFile
+    from zipfile import ZipFile, ZipInfo, ZIP_STORED, ZIP_DEFLATED
     from functools import wraps, partial
     import dataclasses
     from datetime import datetime
     from pathlib import Path
     from json import dumps, loads
     import logging
-    from time import sleep
-    from threading import Event, Thread
+    from time import sleep, monotonic
+    from threading import Event, Thread, Lock
     from concurrent.futures import ThreadPoolExecutor
     threading_available = True
+    from queue import Empty
+    from select import select
+    from hashlib import sha1
+    from base64 import b64encode
+    from os import urandom
+    from stat import S_ISDIR
+    from email.utils import formatdate, parsedate_to_datetime
+    import zlib
     from traceback import format_exception
     import importlib
     from sys import modules
@@ -34,8 +41,10 @@ except ImportError:
         inspect,
         argv,
         ArgumentParser,
-        TemporaryFile,
         ZipFile,
+        ZipInfo,
+        ZIP_STORED,
+        ZIP_DEFLATED,
         wraps,
         partial,
         dataclasses,
@@ -45,11 +54,29 @@ except ImportError:
         loads,
         logging,
         sleep,
+        monotonic,
         Event,
         Thread,
+        Lock,
         ThreadPoolExecutor,
         threading_available,
+        Empty,
+        select,
+        sha1,
+        b64encode,
+        urandom,
+        S_ISDIR,
+        formatdate,
+        parsedate_to_datetime,
+        zlib,
         format_exception,
         importlib,
         modules
-    )
\ No newline at end of file
+    )
+
+# zstd only ships with python 3.14+, so it is optional even with the full standard library
+try:
+    raise_import_error_if_testing('zstd')
+    from compression import zstd
+except ImportError:
+    zstd = None
@@ -1,4 +1,4 @@
-from socketwrench.standardlib_dependencies import partial
+from socketwrench.standardlib_dependencies import inspect, partial
 
 
 def tag(handler=None, **kwargs):
@@ -25,6 +25,64 @@ def private(handler):
     return handler
 
 
+def no_compression(handler):
+    # responses from this handler are never compressed, even if the client accepts it
+    tag(handler, compress=False)
+    return handler
+
+
+def sse(handler=None, keep_alive: float = None, retry: int = None):
+    # the handler's return value (a generator, iterator or queue) gets streamed as an SSEResponse
+    if handler is None:
+        return partial(sse, keep_alive=keep_alive, retry=retry)
+    options = {k: v for k, v in {"keep_alive": keep_alive, "retry": retry}.items() if v is not None}
+    return tag(handler, sse=options)
+
+
+def websocket(handler=None, subprotocols: list = None):
+    # the connection upgrades to a websocket and then runs the handler, which gets the WebSocket autofilled
+    if handler is None:
+        return partial(websocket, subprotocols=subprotocols)
+    options = {"subprotocols": subprotocols} if subprotocols else {}
+    return tag(handler, websocket=options)
+
+
+def batched(handler=None, max_size: int = 32, max_wait_ms: float = 5.0):
+    # concurrent requests are collected and the handler is called once for all of them, each parameter getting a list
+    # with one value per request; it returns a list with one result per request (see batching.Batcher)
+    if handler is None:
+        return partial(batched, max_size=max_size, max_wait_ms=max_wait_ms)
+    if not inspect.signature(handler).parameters:
+        # methods taking only self are caught when their route is added
+        raise ValueError(f"Batched handler {handler} must take at least one parameter, which gets the list of values "
+                         f"from the batched requests")
+    return tag(handler, batched={"max_size": max_size, "max_wait_ms": max_wait_ms})
+
+
+def coalesced(handler):
+    # concurrent GET/HEAD requests for the same route and query share one call of the handler and its response, which
+    # must be safe to send more than once (see batching.SingleFlight)
+    tag(handler, coalesced=True)
+    return handler
+
+
+def cached(handler=None, ttl: float = 60, vary: list = None, stale: float = 0, hot: bool = False):
+    # GET/HEAD responses are kept, serialized, for `ttl` seconds per path, query and the values of the `vary` request
+    # headers, and sent again without calling the handler. For `stale` seconds more they are still sent while one
+    # background call replaces them, and `hot` routes are refreshed in the background before they expire
+    # (see response_cache.ResponseCache)
+    if handler is None:
+        return partial(cached, ttl=ttl, vary=vary, stale=stale, hot=hot)
+    return tag(handler, cached={"ttl": ttl, "vary": tuple(vary or ()), "stale": stale, "hot": hot})
+
+
+def constant(handler):
+    # the handler takes no arguments and always returns the same thing, so it is called once, when its route is added,
+    # and the serialized response is sent for every request
+    tag(handler, constant=True)
+    return handler
+
+
 def allowed_methods(*methods: str, autofill=None):
     def decorator(handler, route: str = None, error_mode: str = None, openapi: dict = None, autofill=None, allowed_methods=None, **kwargs):
         if allowed_methods is None:
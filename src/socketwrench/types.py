@@ -1,23 +1,44 @@
 from socketwrench.standardlib_dependencies import (
     dataclasses,
-    datetime,
     dumps,
+    Empty,
+    formatdate,
     socket,
     Path,
+    urandom,
+    zlib,
+    ZipFile,
+    ZipInfo,
+    ZIP_STORED,
+    ZIP_DEFLATED,
 )
+import socketwrench.json_codec as json_codec
+import socketwrench.serializers as serializers
 
 
 class HTTPVersion(str):
-    """Represents an HTTP version string."""
+    """Represents an HTTP version string. The standard versions are interned, so parsing one allocates nothing."""
+    __slots__ = ()
+    _interned = {}
+
     HTTP_0_9 = "HTTP/0.9"
     HTTP_1_0 = "HTTP/1.0"
     HTTP_1_1 = "HTTP/1.1"
     HTTP_2_0 = "HTTP/2.0"
     HTTP_3_0 = "HTTP/3.0"
 
+    def __new__(cls, s):
+        try:
+            return cls._interned[s]
+        except KeyError:
+            return super().__new__(cls, s)
+
 
 class HTTPMethod(str):
-    """Represents an HTTP method string."""
+    """Represents an HTTP method string. The standard methods are interned, so parsing one allocates nothing."""
+    __slots__ = ()
+    _interned = {}
+
     GET = "GET"
     HEAD = "HEAD"
     POST = "POST"
@@ -28,6 +49,18 @@ class HTTPMethod(str):
     TRACE = "TRACE"
     PATCH = "PATCH"
 
+    def __new__(cls, s):
+        try:
+            return cls._interned[s]
+        except KeyError:
+            return super().__new__(cls, s)
+
+
+for _cls in (HTTPVersion, HTTPMethod):
+    for _k, _v in list(_cls.__dict__.items()):
+        if not _k.startswith("_") and isinstance(_v, str):
+            _cls._interned[_v] = str.__new__(_cls, _v)
+
 
 class FileUploads(list):
     def __getattr__(self, item):
@@ -49,6 +82,7 @@ class FileUploads(list):
 
 
 class Body(bytes):
+    __slots__ = ()
     EMPTY = b""
 
     @property
@@ -57,6 +91,8 @@ class Body(bytes):
 
 
 class RequestBody(Body):
+    __slots__ = ()
+
     def __new__(cls, data: bytes):
         return super().__new__(cls, data)
 
@@ -448,23 +484,39 @@ ContentType.content_types = content_types
 
 class Headers(dict):
     EMPTY = {}
+    _cc_cache = {}
+    # names whose conventional casing isn't plain title case
+    _cc_special = {"etag": "ETag", "te": "TE", "www-authenticate": "WWW-Authenticate", "content-md5": "Content-MD5",
+                   "sec-websocket-key": "Sec-WebSocket-Key", "sec-websocket-accept": "Sec-WebSocket-Accept",
+                   "sec-websocket-version": "Sec-WebSocket-Version", "sec-websocket-protocol": "Sec-WebSocket-Protocol",
+                   "sec-websocket-extensions": "Sec-WebSocket-Extensions"}
+
     def __init__(self, d):
         d = {self.cc(k): v for k, v in d.items()}
         super().__init__(d)
 
-    @staticmethod
-    def cc(k):
-        # replace the first character following a hyphen or a space with its uppercase equivalent
+    @classmethod
+    def cc(cls, k):
+        # canonical header casing, e.g. "content-type" -> "Content-Type", so lookups are case-insensitive
+        # and the keys can be written straight to the wire
+        try:
+            return cls._cc_cache[k]
+        except KeyError:
+            pass
         s = ""
-        cap = False
+        cap = True
         for c in k:
-            if cap:
+            if c in "- ":
+                s += "-"
+                cap = True
+            elif cap:
                 s += c.upper()
                 cap = False
-            elif c in "- ":
-                cap = True
             else:
                 s += c.lower()
+        s = cls._cc_special.get(s.lower(), s)
+        if len(cls._cc_cache) < 1024:
+            cls._cc_cache[k] = s
         return s
 
     def to_string(self) -> str:
@@ -496,6 +548,7 @@ class Headers(dict):
 
 
 class HeaderBytes(bytes):
+    __slots__ = ()
     EMPTY = b""
 
     def __new__(cls, s):
@@ -520,6 +573,7 @@ class HeaderBytes(bytes):
 
 
 class RequestPath(str):
+    __slots__ = ()
     EMPTY = ""
     BASE = "/"
 
@@ -540,13 +594,12 @@ class RequestPath(str):
         q = self.query()
         if not q:
             return {}
-        q = q[1:]
-        items = [v.split("=", 1) if '=' in v else (v, "") for v in q.split("&")]
-        d = {url_decode_query(k): url_decode_query(v) for k, v in items}
-        return d
+        return parse_query_string(q[1:])
 
 
 class ClientAddr(str):
+    __slots__ = ("host", "port")
+
     def __new__(cls, host_port):
     # def __new__(cls, host_port: str | tuple[str, int]):
         if isinstance(host_port, tuple):
@@ -561,12 +614,27 @@ class ClientAddr(str):
         return self
 
 
+def parse_query_string(q: str) -> dict[str, str]:
+    """Parses `a=1&b=two` (a query string or an application/x-www-form-urlencoded body) into a dictionary."""
+    items = [v.split("=", 1) if '=' in v else (v, "") for v in q.split("&")]
+    return {url_decode_query(k): url_decode_query(v) for k, v in items}
+
+
+_UNPARSED = object()
+
+
 class Request:
+    __slots__ = ("method", "path", "version", "header_bytes", "_headers", "body", "_client_address", "_client_addr",
+                 "connection_socket", "origin", "websocket", "_json")
+
     @classmethod
     def from_components(cls, pre_body_bytes: bytes, body: bytes, client_addr: str, connection_socket: socket = None, origin: str = "") -> "Request":
     # def from_components(cls, pre_body_bytes: bytes, body: bytes, client_addr: str | tuple[str, int], connection_socket: socket.socket = None) -> "Request":
         """Create a Request object from a header string and a body bytes object."""
-        i = pre_body_bytes.index(b"\r\n")
+        i = pre_body_bytes.find(b"\r\n")
+        if i == -1:
+            # request line only, no headers
+            i = len(pre_body_bytes)
         first_line = pre_body_bytes[:i].decode()
         method, path, version = first_line.split(" ")
         header_bytes = pre_body_bytes[i + 2:]
@@ -596,20 +664,61 @@ class Request:
         self.method = HTTPMethod(method)
         self.path = RequestPath(path)
         self.version = HTTPVersion(version)
-        self.header_bytes = HeaderBytes(header)
+        self.header_bytes = header if type(header) is HeaderBytes else HeaderBytes(header)
         self._headers = None
-        is_form_data = "form-data" in self.headers.get("Content-Type", "")
-        self.body = RequestBody(body) if not is_form_data else FormBody(body)
-        self.client_addr = ClientAddr(client_addr) if client_addr else None
+        # only parse the headers up front if they could possibly declare a form
+        is_form_data = b"form-data" in self.header_bytes and "form-data" in self.headers.get("Content-Type", "")
+        if is_form_data:
+            self.body = FormBody(body)
+        else:
+            self.body = body if type(body) is RequestBody else RequestBody(body)
+        self.client_addr = client_addr
         self.connection_socket = connection_socket
         self.origin = origin
+        self.websocket = None
+        self._json = _UNPARSED
 
     @property
     def headers(self) -> Headers:
         if self._headers is None:
-            self._headers = Headers(self.header_bytes.to_dict())
+            self._headers = self.header_bytes.to_dict()
         return self._headers
 
+    @property
+    def client_addr(self) -> ClientAddr:
+        # built on first use, most handlers never look at it
+        if self._client_addr is None and self._client_address:
+            self._client_addr = ClientAddr(self._client_address)
+        return self._client_addr
+
+    @client_addr.setter
+    def client_addr(self, client_addr):
+        self._client_address = client_addr
+        self._client_addr = client_addr if isinstance(client_addr, ClientAddr) else None
+
+    @property
+    def media_type(self) -> str:
+        """The Content-Type without its parameters, lowercased, e.g. 'application/json', or '' if there is none."""
+        content_type = self.headers.get("Content-Type")
+        if not content_type:
+            return ""
+        return content_type.split(";", 1)[0].strip().lower()
+
+    @property
+    def json(self):
+        """The body parsed by the configured JSON codec. It is parsed once and kept, and raises ValueError if the body
+        isn't valid JSON."""
+        if self._json is _UNPARSED:
+            self._json = json_codec.codec.loads(self.body)
+        return self._json
+
+    @property
+    def form(self) -> dict[str, str]:
+        """The fields of an application/x-www-form-urlencoded body, or {} for any other kind of body."""
+        if not self.body or self.media_type != "application/x-www-form-urlencoded":
+            return {}
+        return parse_query_string(self.body.decode("utf-8", "replace"))
+
     def to_string(self) -> str:
         return f'{self.method} {self.path} {self.version}\r\n{self.headers}\r\n\r\n{self.body}'
 
@@ -646,7 +755,7 @@ class Request:
 
 
 class ResponseBody(Body):
-    pass
+    __slots__ = ()
 
 
 class HTTPStatusCode(int):
@@ -723,6 +832,11 @@ class HTTPStatusCode(int):
     NETWORK_AUTHENTICATION_REQUIRED = 511
 
     def __new__(cls, status_code: int, phrase: str = None):
+        if phrase is None:
+            # reuse the named constants (and their already looked up phrases)
+            interned = _interned_status_codes.get(status_code)
+            if interned is not None:
+                return interned
         self = super().__new__(cls, status_code)
         self._phrase = phrase
         return self
@@ -756,10 +870,12 @@ class HTTPStatusCode(int):
         return f'{int(self)} {self.phrase()}'
 
 
+_interned_status_codes = {}
 status_code_names = {v: k for k, v in HTTPStatusCode.__dict__.items() if (not k.startswith("_")) and isinstance(v, int)}
-for k, v in HTTPStatusCode.__dict__.items():
+for k, v in list(HTTPStatusCode.__dict__.items()):
     if isinstance(v, int):
         setattr(HTTPStatusCode, k, HTTPStatusCode(v, k.replace("_", " ")))
+        _interned_status_codes.setdefault(v, getattr(HTTPStatusCode, k))
 
 
 class ResponseTypehint:
@@ -775,7 +891,11 @@ class ResponseType(type):
 
 
 class Response(Exception, metaclass=ResponseType):
+    # subclasses may still set other attributes, they go in the (lazily created) dict every exception has
+    __slots__ = ("status_code", "version", "headers", "body", "raw")
     default_content_type = None
+    # set to False (e.g. by the @no_compression tag) to keep the compression stage away from a response
+    compressible = True
     default_status_code = HTTPStatusCode.OK
 
     @classmethod
@@ -815,6 +935,8 @@ class Response(Exception, metaclass=ResponseType):
             elif isinstance(body, str):
                 return super(Response, HTMLResponse).__new__(HTMLResponse)
             elif isinstance(body, Path):
+                if body.is_dir():
+                    return super(Response, StreamedZipResponse).__new__(StreamedZipResponse)
                 return super(Response, FileResponse).__new__(FileResponse)
             elif isinstance(body, Exception):
                 return super(Response, ErrorResponse).__new__(ErrorResponse)
@@ -835,19 +957,28 @@ class Response(Exception, metaclass=ResponseType):
             status_code = self.default_status_code
         self.status_code = HTTPStatusCode(status_code)
         self.version = HTTPVersion(version)
-        self.header_bytes = HeaderBytes(headers)
-        self.headers = Headers(self.header_bytes.to_dict())
+        if isinstance(headers, dict):
+            self.headers = Headers(headers)
+        elif headers:
+            self.headers = HeaderBytes(headers).to_dict()
+        else:
+            self.headers = Headers({})
         for k, v in headers_kwargs.items():
             t = k.replace("_", " ").title().replace(" ", "-")
             if not isinstance(v, str):
                 v = dumps(v)
             self.headers[t] = v
-        self.body = ResponseBody(body)
+        # bytes are kept as they are, wrapping them in a ResponseBody would copy the whole body
+        self.body = body if type(body) is bytes or type(body) is ResponseBody else ResponseBody(body)
         self.raw = raw
         super().__init__(self.body, self.status_code, self.headers, self.version)
 
-    def pre_body_bytes(self) -> bytes:
-        return f'{self.version} {self.status_code}\r\n{self.headers}\r\n'.encode()
+    @property
+    def header_bytes(self) -> HeaderBytes:
+        return HeaderBytes(self.headers)
+
+    def pre_body_bytes(self, extra_headers: str = "") -> bytes:
+        return f'{self.version} {self.status_code}\r\n{self.headers}{extra_headers}\r\n'.encode()
 
     def __str__(self):
         return repr(self)
@@ -881,8 +1012,8 @@ class RawResponse(Response):
             header_end = first_line_end + 2 + full_response_bytes[first_line_end + 2:].index(b"\r\n\r\n")
             header_bytes = full_response_bytes[first_line_end + 2:header_end]
 
-            version = HTTPVersion(version)
-            status_code = HTTPStatusCode(int(status_code), phrase)
+            version = HTTPVersion(version.decode())
+            status_code = HTTPStatusCode(int(status_code), phrase.decode())
             header_bytes = HeaderBytes(header_bytes)
             headers = Headers(header_bytes.to_dict())
             body = ResponseBody(full_response_bytes[header_end + 4:])
@@ -1039,8 +1170,8 @@ class RawResponse(Response):
             header_end = first_line_end + 2 + full_response_bytes[first_line_end + 2:].index(b"\r\n\r\n")
             header_bytes = full_response_bytes[first_line_end + 2:header_end]
 
-            version = HTTPVersion(version)
-            status_code = HTTPStatusCode(int(status_code), phrase)
+            version = HTTPVersion(version.decode())
+            status_code = HTTPStatusCode(int(status_code), phrase.decode())
             header_bytes = HeaderBytes(header_bytes)
             headers = Headers(header_bytes.to_dict())
             body = ResponseBody(full_response_bytes[header_end + 4:])
@@ -1060,7 +1191,15 @@ class FileResponse(SuccessResponse):
 
     default_content_type = None
 
-    def __new__(cls, *args, **kwargs):
+    def __new__(cls, *a, **kwargs):
+        path = kwargs.get("path") or (a[0] if len(a) == 1 and isinstance(a[0], (str, Path)) else None)
+        if path and Path(path).is_dir():
+            # folders are zipped on the fly rather than read into memory
+            return StreamedZipResponse(Path(path),
+                                       status_code=kwargs.get("status_code", 200),
+                                       headers=kwargs.get("headers"),
+                                       version=kwargs.get("version", "HTTP/1.1"),
+                                       download=kwargs.get("download", False))
         return super().__new__(cls)
 
     def __init__(self,
@@ -1074,7 +1213,13 @@ class FileResponse(SuccessResponse):
                  content_type: str = None,
                  download: bool = False,
                  version: str = "HTTP/1.1",
-                 raw: bool = False):
+                 raw: bool = False,
+                 stat_result=None,
+                 weak_etag: bool = False):
+        """A file from disk (`path`) or memory (`body`).
+
+        For files on disk, `ETag` and `Last-Modified` validators are added from `stat_result` (stat'ed if not given).
+        """
         if raw:
             raise NotImplementedError
         if content_type is None and self.default_content_type is not None:
@@ -1136,25 +1281,16 @@ class FileResponse(SuccessResponse):
             headers["Content-Disposition"] = f'attachment; filename="{filename}"'
 
         # add headers related to file stats
+        if path and stat_result is None:
+            stat_result = path.stat()
         if "Content-Length" not in headers:
-            headers["Content-Length"] = str(path.stat().st_size) if path else str(len(body))
+            headers["Content-Length"] = str(stat_result.st_size) if path else str(len(body))
         if "Last-Modified" not in headers:
-            headers["Last-Modified"] = datetime.fromtimestamp(path.stat().st_mtime).isoformat() if path else datetime.now().isoformat()
-
-        if path and path.is_dir():
-            from socketwrench.standardlib_dependencies import TemporaryFile, ZipFile
-            # zip the directory to a TemporaryFile
-            with TemporaryFile() as f:
-                with ZipFile(f, "w") as z:
-                    for p in path.iterdir():
-                        z.write(p, p.name)
-                f.seek(0)
-                super().__init__(f.read(),
-                                 status_code=status_code,
-                                 headers=headers,
-                                 content_type="application/zip",
-                                 version=version)
-        elif path:
+            headers["Last-Modified"] = self.http_date(stat_result.st_mtime if path else None)
+        if path and "ETag" not in headers:
+            headers["ETag"] = self.etag(stat_result, weak=weak_etag)
+
+        if path:
             if content_type is None:
                 content_type = self.get_content_type(path.suffix[1:])
 
@@ -1183,6 +1319,17 @@ class FileResponse(SuccessResponse):
     def get_content_type(self, suffix: str):
         return self.content_types.get(suffix.lower(), self.content_types[self.default_content_type])
 
+    @staticmethod
+    def http_date(timestamp: float = None) -> str:
+        """Formats a timestamp (default now) as an RFC 9110 / RFC 1123 date, e.g. 'Sun, 06 Nov 1994 08:49:37 GMT'."""
+        return formatdate(timestamp, usegmt=True)
+
+    @staticmethod
+    def etag(stat_result, weak: bool = False) -> str:
+        """An entity tag derived from a file's inode, size and modification time, so computing it never reads the file."""
+        tag = f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+        return "W/" + tag if weak else tag
+
     def get_extension(self, content_type: str):
         for k, v in self.content_types.items():
             if v == content_type:
@@ -1306,37 +1453,102 @@ class TBDBResponse(StandardHTMLResponse):
 
 class JSONResponse(SuccessResponse):
     def __init__(self, data: str | dict | list | tuple | int | float, status_code: int = 200, headers: dict = None,
-                 version: str = "HTTP/1.1", raw: bool = False):
+                 version: str = "HTTP/1.1", raw: bool = False, encoder=None):
+        """`data` is encoded straight to bytes by the configured JSON codec (see `json_codec`), or by `encoder` if the
+        caller already knows how to encode it (see `json_encoder_for`). A str is taken to be JSON already."""
         if headers is None:
             headers = {}
         headers = Headers(headers)
         if "Content-Type" not in headers:
             headers["Content-Type"] = "application/json"
-        if not isinstance(data, str):
-            if isinstance(data, tuple):
-                data = list(data)
-            if dataclasses and dataclasses.is_dataclass(data):
-                data = dataclasses.asdict(data)
+        if encoder is not None:
+            body = encoder(data)
+        elif isinstance(data, str):
+            body = data.encode()
+        else:
+            body = self.encode(data)
+        super().__init__(body, status_code, headers, version, raw=raw)
 
-            if hasattr(data, "to_json"):
-                try:
-                    data = data.to_json()
-                except:
-                    if hasattr(data, "to_dict"):
-                        try:
-                            data = dumps(data.to_dict())
-                        except:
-                            data = str(data)
-                    else:
-                        data = str(data)
-            elif hasattr(data, "to_dict"):
-                try:
-                    data = dumps(data.to_dict())
-                except:
-                    data = str(data)
-            else:
-                data = dumps(data)
-        super().__init__(data.encode(), status_code, headers, version, raw=raw)
+    @staticmethod
+    def encode(data) -> bytes:
+        """Encodes any value: plain JSON types directly, then dataclasses, objects with `to_json` or `to_dict`."""
+        if type(data) in _plain_json_types:
+            return json_codec.codec.dumps(data)
+        if dataclasses and dataclasses.is_dataclass(data):
+            return _dataclass_encoder(type(data))(data)
+        if hasattr(data, "to_json"):
+            try:
+                return data.to_json().encode()
+            except:
+                if hasattr(data, "to_dict"):
+                    try:
+                        return json_codec.codec.dumps(data.to_dict())
+                    except:
+                        return str(data).encode()
+                return str(data).encode()
+        if hasattr(data, "to_dict"):
+            try:
+                return json_codec.codec.dumps(data.to_dict())
+            except:
+                return str(data).encode()
+        return json_codec.codec.dumps(data)
+
+
+_plain_json_types = frozenset((dict, list, tuple, int, float, bool, type(None)))
+
+
+def _encode_plain(data) -> bytes:
+    return json_codec.codec.dumps(data)
+
+
+def _dataclass_encoder(cls):
+    serialize = serializers.compile_serializer(cls)
+
+    def encode(data) -> bytes:
+        try:
+            return json_codec.codec.dumps(serialize(data))
+        except (TypeError, AttributeError):
+            # a field holds something its annotation didn't promise, e.g. a dataclass in a field typed `int`
+            return json_codec.codec.dumps(serializers.to_plain(data))
+    return encode
+
+
+def _dataclass_list_encoder(cls):
+    serialize = serializers.compile_serializer(cls)
+
+    def encode(data) -> bytes:
+        try:
+            return json_codec.codec.dumps([serialize(item) for item in data])
+        except (TypeError, AttributeError):
+            # items which aren't `cls` after all
+            return json_codec.codec.dumps(serializers.to_plain(data))
+    return encode
+
+
+def _is_dataclass_type(annotation) -> bool:
+    return bool(dataclasses) and isinstance(annotation, type) and dataclasses.is_dataclass(annotation)
+
+
+def json_encoder_for(return_annotation):
+    """Picks how a handler's return values will be encoded, from its return annotation, once when it is wrapped.
+
+    Returns (type, encoder) for annotations which say the value is JSON (dict, list, tuple, their generic forms like
+    list[int], or a dataclass), or None to leave it to `Response`. The encoder is only used for values whose type turns
+    out to be exactly that type, so a wrong annotation costs nothing but the check. Dataclasses and `list[Dataclass]`
+    get a serializer compiled for that dataclass (see `serializers`) instead of going through `dataclasses.asdict`.
+    """
+    if isinstance(return_annotation, str):
+        return None
+    annotation = getattr(return_annotation, "__origin__", return_annotation)
+    if annotation is list:
+        args = getattr(return_annotation, "__args__", None) or ()
+        if len(args) == 1 and _is_dataclass_type(args[0]):
+            return list, _dataclass_list_encoder(args[0])
+    if annotation in (dict, list, tuple):
+        return annotation, _encode_plain
+    if _is_dataclass_type(annotation):
+        return annotation, _dataclass_encoder(annotation)
+    return None
 
 
 class ErrorResponse(ServerError):
@@ -1380,6 +1592,451 @@ class PermanentRedirect(RedirectResponse):
         super().__init__(location, status_code, headers, version, raw=raw)
 
 
+class SSEEvent:
+    """A single Server-Sent Event, rendered to a `text/event-stream` frame by `bytes(event)`."""
+    def __init__(self, data=None, event: str = None, id: str = None, retry: int = None):
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+
+    def __bytes__(self):
+        lines = []
+        if self.event:
+            lines.append(f"event: {self.event}")
+        if self.id is not None:
+            lines.append(f"id: {self.id}")
+        if self.retry is not None:
+            lines.append(f"retry: {int(self.retry)}")
+        data = self.data
+        if data is not None:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                data = bytes(data).decode()
+            elif not isinstance(data, str):
+                data = dumps(data)
+            lines.extend(f"data: {line}" for line in (data.splitlines() or [""]))
+        return ("\n".join(lines) + "\n\n").encode()
+
+    def __repr__(self):
+        return f"<SSEEvent {self.event or 'message'} {self.data!r:.80}>"
+
+
+class SSEResponse(SuccessResponse):
+    """Holds the connection open and streams `text/event-stream` frames from a generator, iterator or queue.
+
+    Nothing here ever blocks: generators may yield `None` to say no event is ready yet, and queues (anything with
+    `get_nowait`) are drained until empty. This lets the server service every subscriber from a single thread.
+    Yield or put `SSEResponse.CLOSE` to end the stream.
+    """
+    default_content_type = "text/event-stream"
+    default_keep_alive = 15
+    default_max_events_per_pull = 64
+    KEEP_ALIVE = b": keep-alive\n\n"
+    CLOSE = SSEEvent(event="close")
+
+    def __init__(self,
+                 source,
+                 keep_alive: float = default_keep_alive,
+                 retry: int = None,
+                 max_events_per_pull: int = default_max_events_per_pull,
+                 status_code: int = 200,
+                 headers: dict = None,
+                 version: str = "HTTP/1.1",
+                 raw: bool = False):
+        if headers is None:
+            headers = {}
+        headers = Headers(headers)
+        if "Content-Type" not in headers:
+            headers["Content-Type"] = self.default_content_type
+        if "Cache-Control" not in headers:
+            headers["Cache-Control"] = "no-cache"
+        if "X-Accel-Buffering" not in headers:
+            headers["X-Accel-Buffering"] = "no"
+        super().__init__(b"", status_code, headers, version, raw=raw)
+        self.source = source
+        self._iterator = None if hasattr(source, "get_nowait") else iter(source)
+        self.keep_alive = keep_alive
+        self.max_events_per_pull = max_events_per_pull
+        self.finished = False
+        self._pending = [bytes(SSEEvent(retry=retry))] if retry is not None else []
+
+    def pull(self) -> list:
+        """Returns the frames which are ready to send right now, or None once the stream has ended."""
+        if self.finished:
+            return None
+        frames, self._pending = self._pending, []
+        while len(frames) < self.max_events_per_pull:
+            try:
+                if self._iterator is None:
+                    item = self.source.get_nowait()
+                else:
+                    item = next(self._iterator)
+            except Empty:
+                break
+            except StopIteration:
+                self.close()
+                break
+            if item is None:
+                if self._iterator is None:
+                    continue
+                break
+            if item is self.CLOSE:
+                self.close()
+                break
+            frames.append(bytes(item) if isinstance(item, SSEEvent) else bytes(SSEEvent(item)))
+        if self.finished and not frames:
+            return None
+        return frames
+
+    def close(self):
+        """Marks the stream finished and lets a generator source run its cleanup (`finally`) blocks."""
+        self.finished = True
+        if self._iterator is not None and hasattr(self._iterator, "close"):
+            try:
+                self._iterator.close()
+            except Exception:
+                pass
+
+
+class WebSocketResponse(InformationalResponse):
+    """Returned for routes tagged `@websocket`: the Connection completes the upgrade handshake and then runs `session`.
+
+    `session` is called with no arguments (the route's parsed arguments, including the autofilled WebSocket, are
+    already bound), on the connection's thread, and the socket is closed when it returns.
+    """
+    default_status_code = 101
+
+    def __init__(self, session, subprotocols=None, version: str = "HTTP/1.1"):
+        super().__init__(b"", version=version)
+        self.session = session
+        self.subprotocols = subprotocols
+
+
+class PrebuiltResponse(Response):
+    """A response whose headers were serialized ahead of time (e.g. by a cache), so sending it formats nothing.
+
+    `headers` is kept for inspection and may be shared between responses, so it must not be modified.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        # Response.__new__ would take the header block for the body and status_code twice
+        return super().__new__(cls)
+
+    def __init__(self, header_block: bytes, body: bytes, headers: Headers, status_code: int = 200,
+                 version: str = "HTTP/1.1"):
+        self.status_code = HTTPStatusCode(status_code)
+        self.version = HTTPVersion(version)
+        self.headers = headers
+        self.body = body
+        self.raw = False
+        self.header_block = header_block
+
+    def pre_body_bytes(self, extra_headers: str = "") -> bytes:
+        return b"".join((f"{self.version} {self.status_code}\r\n".encode(), self.header_block,
+                         extra_headers.encode(), b"\r\n"))
+
+    @classmethod
+    def from_response(cls, response: Response):
+        """`response` with its headers (and Content-Length) serialized, or None if it is streamed or raw bytes."""
+        if isinstance(response, StreamedResponse) or response.headers is None:
+            return None
+        body = response.body
+        if not isinstance(body, bytes):
+            return None
+        headers = Headers(dict(response.headers))
+        headers["Content-Length"] = str(len(body))
+        prebuilt = cls(headers.to_bytes(), body, headers, status_code=response.status_code, version=response.version)
+        if not getattr(response, "compressible", True):
+            prebuilt.compressible = False
+        # filled in by the ResponseCompressor, so a response sent again and again is only compressed once per coding
+        prebuilt.compressed = {}
+        return prebuilt
+
+    def for_version(self, version: str) -> "PrebuiltResponse":
+        """This response, or a copy sharing its bytes if the request is for another HTTP version."""
+        if version == self.version:
+            return self
+        return PrebuiltResponse(self.header_block, self.body, self.headers, status_code=self.status_code,
+                                version=version)
+
+
+class FileSlice:
+    """`count` bytes of the file at `path` starting at `offset`, sent with `socket.sendfile` instead of read into memory."""
+    __slots__ = ("path", "offset", "count")
+
+    def __init__(self, path, offset: int = 0, count: int = None):
+        self.path = Path(path)
+        self.offset = offset
+        self.count = count if count is not None else self.path.stat().st_size - offset
+
+    def iter_chunks(self, chunk_size: int = 64 * 1024):
+        """Reads the slice piece by piece, for sockets (or tests) without sendfile."""
+        remaining = self.count
+        with self.path.open("rb") as f:
+            f.seek(self.offset)
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def read(self) -> bytes:
+        return b"".join(self.iter_chunks())
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({self.path}, offset={self.offset}, count={self.count})>"
+
+
+class StreamedResponse(Response):
+    """A response whose body is not held in memory: the Connection writes whatever `parts()` yields (bytes or
+    FileSlice) after the headers. Subclasses set the Content-Length header if they know it up front."""
+
+    def parts(self):
+        return iter(())
+
+    def __bytes__(self):
+        return self.pre_body_bytes() + b"".join(p.read() if isinstance(p, FileSlice) else bytes(p) for p in self.parts())
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.status_code} {self.headers.get('Content-Length', '?')} bytes>"
+
+
+class StreamedFileResponse(StreamedResponse):
+    """Streams a whole file, or byte ranges of it (206 Partial Content, multipart/byteranges for several), from disk."""
+    max_ranges = 64
+
+    def __init__(self,
+                 path,
+                 ranges: list = None,
+                 stat_result=None,
+                 content_type: str = None,
+                 headers: dict = None,
+                 version: str = "HTTP/1.1"):
+        """
+        Args:
+            path: the file to send.
+            ranges (list[tuple[int, int]], optional): inclusive (first, last) byte positions, as returned by
+                `parse_range`. Defaults to None, the whole file with a 200.
+            stat_result (os.stat_result, optional): the file's stat, if the caller already has it.
+        """
+        path = Path(path)
+        self.path = path
+        size = (stat_result or path.stat()).st_size
+        if content_type is None:
+            content_type = FileType.content_types.get(path.suffix[1:].lower(), FileType.content_types[None])
+        headers = Headers(headers or {})
+        headers["Accept-Ranges"] = "bytes"
+        self._parts = []
+        if not ranges:
+            status_code = 200
+            headers["Content-Type"] = content_type
+            self._parts.append(FileSlice(path, 0, size))
+            length = size
+        elif len(ranges) == 1:
+            status_code = 206
+            first, last = ranges[0]
+            headers["Content-Type"] = content_type
+            headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+            self._parts.append(FileSlice(path, first, last - first + 1))
+            length = last - first + 1
+        else:
+            status_code = 206
+            boundary = urandom(12).hex()
+            headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+            length = 0
+            for i, (first, last) in enumerate(ranges):
+                part_head = (b"" if i == 0 else b"\r\n") + (
+                    f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Range: bytes {first}-{last}/{size}\r\n\r\n").encode()
+                self._parts.append(part_head)
+                self._parts.append(FileSlice(path, first, last - first + 1))
+                length += len(part_head) + last - first + 1
+            tail = f"\r\n--{boundary}--\r\n".encode()
+            self._parts.append(tail)
+            length += len(tail)
+        headers["Content-Length"] = str(length)
+        super().__init__(b"", status_code=status_code, headers=headers, version=version)
+
+    def parts(self):
+        return iter(self._parts)
+
+    @classmethod
+    def parse_range(cls, range_header: str, size: int):
+        """Parses a `Range: bytes=...` header against a file of `size` bytes (RFC 9110 14.1.2).
+
+        Returns a sorted list of inclusive (first, last) positions with overlapping or adjacent ranges merged,
+        [] if no range is satisfiable (answer 416), or None if the header should be ignored (answer 200).
+        """
+        unit, _, spec = range_header.partition("=")
+        if unit.strip().lower() != "bytes" or not spec.strip():
+            return None
+        ranges = []
+        for r in spec.split(","):
+            r = r.strip()
+            if not r:
+                continue
+            first, dash, last = r.partition("-")
+            first, last = first.strip(), last.strip()
+            if not dash or (first and not first.isdigit()) or (last and not last.isdigit()) or not (first or last):
+                return None
+            if not first:
+                # suffix range, the last N bytes
+                n = int(last)
+                if n == 0 or size == 0:
+                    # an empty file has no last bytes to send
+                    continue
+                ranges.append((max(size - n, 0), size - 1))
+                continue
+            first = int(first)
+            if last and int(last) < first:
+                return None
+            last = int(last) if last else size - 1
+            if first >= size:
+                continue
+            ranges.append((first, min(last, size - 1)))
+        if len(ranges) > cls.max_ranges:
+            return None
+        ranges.sort()
+        merged = []
+        for first, last in ranges:
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else:
+                merged.append((first, last))
+        return merged
+
+
+class _ZipSink:
+    """The unseekable file a StreamedZipResponse's ZipFile writes to, emptied into the response after every write."""
+    __slots__ = ("chunks",)
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class StreamedZipResponse(StreamedResponse):
+    """Zips a folder, recursively, while it is being sent: each entry goes out as soon as it is compressed, so the
+    first bytes leave immediately and the archive is never held in memory or on disk.
+
+    ZipFile writes to an unseekable stream here, so every entry is followed by a data descriptor, and ZIP64 records are
+    used for files or archives past 4 GiB. The total size isn't known up front, so HTTP/1.1 clients get the archive
+    chunked and HTTP/1.0 ones get it followed by the connection closing.
+    """
+    chunk_size = 64 * 1024
+    # entries this big (with zipfile's allowance for deflate growing them) need ZIP64 records
+    zip64_limit = (1 << 31) - 1
+    # already compressed formats, which deflate would only slow down
+    stored_suffixes = {"zip", "gz", "tgz", "bz2", "xz", "zst", "br", "7z", "rar", "jpg", "jpeg", "png", "gif", "webp",
+                       "avif", "mp3", "mp4", "m4a", "mov", "mkv", "webm", "ogg", "woff", "woff2", "pdf"}
+
+    def __init__(self,
+                 path,
+                 status_code: int = 200,
+                 headers: dict = None,
+                 version: str = "HTTP/1.1",
+                 download: bool = False,
+                 compression: bool = True,
+                 compresslevel: int = None,
+                 **kwargs):
+        """
+        Args:
+            path: the folder to zip.
+            download (bool, optional): add a Content-Disposition header naming the archive "<folder>.zip".
+            compression (bool, optional): deflate entries (if zlib is available), or store them as they are.
+            compresslevel (int, optional): the deflate level, 0-9. Defaults to zlib's default, 6. Before python 3.13
+                deflated entries then lose their timestamps and permissions, which zipfile can only combine with a
+                level of its own choosing.
+        """
+        path = Path(path)
+        self.path = path
+        self.compression = ZIP_DEFLATED if compression and zlib is not None else ZIP_STORED
+        self.compresslevel = compresslevel
+        headers = Headers(headers) if isinstance(headers, dict) else Headers({})
+        headers["Content-Type"] = "application/zip"
+        # the archive changes whenever anything below the folder does, which the folder's own stat doesn't show, so
+        # validators derived from it would give stale 304s
+        headers.pop("ETag", None)
+        headers.pop("Last-Modified", None)
+        if download and "Content-Disposition" not in headers:
+            headers["Content-Disposition"] = f'attachment; filename="{path.name or "archive"}.zip"'
+        super().__init__(b"", status_code=status_code or 200, headers=headers, version=version)
+
+    def entries(self, folder: Path = None, prefix: str = ""):
+        """Yields (path, name in the archive) for every folder and file below `folder`, depth first, in name order.
+        Symlinked folders are not followed, so links can't make the walk loop."""
+        folder = self.path if folder is None else folder
+        try:
+            children = sorted(folder.iterdir())
+        except OSError:
+            return
+        for child in children:
+            name = prefix + child.name
+            if child.is_dir() and not child.is_symlink():
+                yield child, name + "/"
+                yield from self.entries(child, name + "/")
+            elif child.is_file():
+                yield child, name
+
+    def parts(self):
+        sink = _ZipSink()
+        with ZipFile(sink, "w", compression=self.compression, compresslevel=self.compresslevel) as z:
+            for p, name in self.entries():
+                try:
+                    zinfo = ZipInfo.from_file(p, name)
+                    src = None if zinfo.is_dir() else p.open("rb")
+                except OSError:
+                    # removed since the walk saw it, and the headers are already out, so skip it
+                    continue
+                if src is None:
+                    z.writestr(zinfo, b"")
+                else:
+                    if p.suffix[1:].lower() in self.stored_suffixes:
+                        zinfo.compress_type = ZIP_STORED
+                        entry = zinfo
+                    elif self.compresslevel is None:
+                        zinfo.compress_type = self.compression
+                        entry = zinfo
+                    elif hasattr(ZipInfo, "compress_level"):
+                        # python 3.13+
+                        zinfo.compress_type = self.compression
+                        zinfo.compress_level = self.compresslevel
+                        entry = zinfo
+                    else:
+                        # only entries opened by name get the ZipFile's level, at the cost of their timestamp and
+                        # permissions; their size isn't known to it either, so ask for ZIP64 records when needed
+                        entry = name
+                    with src, z.open(entry, "w", force_zip64=zinfo.file_size * 1.05 > self.zip64_limit) as dst:
+                        while True:
+                            chunk = src.read(self.chunk_size)
+                            if not chunk:
+                                break
+                            dst.write(chunk)
+                            if sink.chunks:
+                                yield sink.drain()
+                if sink.chunks:
+                    yield sink.drain()
+        yield sink.drain()
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.status_code} {self.path}>"
+
+
 url_encodings = {
     " ": "%20",
     "!": "%21",
@@ -1623,12 +2280,12 @@ def url_encode_query(s: str) -> str:
 
 
 def url_decode(s: str, is_query=False) -> str:
-    for e, k in url_encodings.items():
-        s = s.replace(k, e)
-    if is_query:
-        extra_decodings = {"+": " "}
-        for k, e in extra_decodings.items():
+    if "%" in s:
+        # every encoding starts with "%", so most query values (plain words and numbers) skip the table entirely
+        for e, k in url_encodings.items():
             s = s.replace(k, e)
+    if is_query and "+" in s:
+        s = s.replace("+", " ")
     return s
 
 def url_decode_query(s: str) -> str:
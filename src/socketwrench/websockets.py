@@ -0,0 +1,421 @@
+"""RFC 6455 WebSocket support: the opening handshake, frame encoding/decoding and a small blocking client."""
+from socketwrench.standardlib_dependencies import (
+    b64encode,
+    logging,
+    sha1,
+    socket,
+    urandom,
+)
+
+from socketwrench.types import Request, Response, Headers, HTTPStatusCode
+
+logger = logging.getLogger("socketwrench")
+
+
+class Opcode:
+    CONTINUATION = 0x0
+    TEXT = 0x1
+    BINARY = 0x2
+    CLOSE = 0x8
+    PING = 0x9
+    PONG = 0xA
+
+    CONTROL = (CLOSE, PING, PONG)
+    DATA = (CONTINUATION, TEXT, BINARY)
+
+
+class CloseCode:
+    NORMAL = 1000
+    GOING_AWAY = 1001
+    PROTOCOL_ERROR = 1002
+    UNSUPPORTED_DATA = 1003
+    NO_STATUS = 1005
+    INVALID_PAYLOAD = 1007
+    POLICY_VIOLATION = 1008
+    MESSAGE_TOO_BIG = 1009
+    INTERNAL_ERROR = 1011
+
+
+class WebSocketClosed(ConnectionError):
+    def __init__(self, code: int = CloseCode.NO_STATUS, reason: str = ""):
+        super().__init__(f"WebSocket closed ({code}) {reason}".strip())
+        self.code = code
+        self.reason = reason
+
+
+class ProtocolError(ValueError):
+    def __init__(self, message: str, code: int = CloseCode.PROTOCOL_ERROR):
+        super().__init__(message)
+        self.code = code
+
+
+def apply_mask(payload: bytes, mask: bytes) -> bytes:
+    """XORs the payload with the 4-byte masking key (masking and unmasking are the same operation)."""
+    if not payload:
+        return b""
+    n = len(payload)
+    # XOR as one big integer rather than byte by byte, which is much faster in pure python
+    key = int.from_bytes((mask * (n // 4 + 1))[:n], "big")
+    return (int.from_bytes(payload, "big") ^ key).to_bytes(n, "big")
+
+
+def encode_frame(opcode: int, payload: bytes = b"", fin: bool = True, mask: bool = False) -> bytes:
+    """Encodes a single frame. Clients must mask every frame they send, servers must never mask."""
+    payload = bytes(payload)
+    header = bytearray()
+    header.append((0x80 if fin else 0) | opcode)
+    n = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if n < 126:
+        header.append(mask_bit | n)
+    elif n < (1 << 16):
+        header.append(mask_bit | 126)
+        header += n.to_bytes(2, "big")
+    else:
+        header.append(mask_bit | 127)
+        header += n.to_bytes(8, "big")
+    if mask:
+        key = urandom(4)
+        header += key
+        payload = apply_mask(payload, key)
+    return bytes(header) + payload
+
+
+def decode_frame(data) -> tuple:
+    """Decodes one frame from the start of `data`.
+
+    Returns (fin, opcode, payload, masked, frame_length), or None if `data` does not yet hold a complete frame.
+    Masked payloads are unmasked; the caller decides whether masking was required.
+    """
+    if len(data) < 2:
+        return None
+    b0, b1 = data[0], data[1]
+    if b0 & 0x70:
+        raise ProtocolError("Reserved bits set without a negotiated extension.")
+    fin = bool(b0 & 0x80)
+    opcode = b0 & 0x0F
+    masked = bool(b1 & 0x80)
+    n = b1 & 0x7F
+    i = 2
+    if n == 126:
+        if len(data) < 4:
+            return None
+        n = int.from_bytes(data[2:4], "big")
+        i = 4
+    elif n == 127:
+        if len(data) < 10:
+            return None
+        n = int.from_bytes(data[2:10], "big")
+        i = 10
+    if masked:
+        if len(data) < i + 4:
+            return None
+        key = bytes(data[i:i + 4])
+        i += 4
+    end = i + n
+    if len(data) < end:
+        return None
+    payload = bytes(data[i:end])
+    if masked:
+        payload = apply_mask(payload, key)
+    return fin, opcode, payload, masked, end
+
+
+class WebSocket:
+    """A WebSocket session over an already-connected socket.
+
+    On the server the Connection creates one for every `Upgrade: websocket` request and autofills it into handlers
+    (any parameter named `websocket` or typed as `WebSocket`). Once the handler is running the handshake has already
+    been sent. `receive()` answers pings and reassembles fragmented messages; iterate to read messages until close.
+    """
+    GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+    default_max_message_size = 16 * 1024 * 1024
+    default_poll_interval = 1
+    default_chunk_size = 4096
+
+    def __init__(self,
+                 connection_socket: socket.socket,
+                 request: Request = None,
+                 is_client: bool = False,
+                 cleanup_event=None,
+                 max_message_size: int = default_max_message_size,
+                 initial_data: bytes = b""):
+        self.socket = connection_socket
+        self.request = request
+        self.is_client = is_client
+        self.cleanup_event = cleanup_event
+        self.max_message_size = max_message_size
+        self.subprotocol = None
+        self.accepted = is_client
+        self.closed = False
+        self.close_code = None
+        self.close_reason = ""
+        self._buffer = bytearray(initial_data)
+
+    @classmethod
+    def is_upgrade_request(cls, request: Request) -> bool:
+        headers = request.headers
+        return (request.method == "GET"
+                and "websocket" in headers.get("Upgrade", "").lower()
+                and "upgrade" in headers.get("Connection", "").lower())
+
+    @classmethod
+    def accept_key(cls, key: str) -> str:
+        if sha1 is None:
+            raise NotImplementedError("hashlib is required for websockets.")
+        return b64encode(sha1((key.strip() + cls.GUID).encode()).digest()).decode()
+
+    def handshake_response(self, subprotocols=None) -> Response:
+        """Builds the `101 Switching Protocols` response for this upgrade request, or a 4xx if the request is invalid."""
+        headers = self.request.headers
+        key = headers.get("Sec-WebSocket-Key", "")
+        if not key:
+            return Response(b"Missing Sec-WebSocket-Key", status_code=HTTPStatusCode.BAD_REQUEST,
+                            headers={"Content-Type": "text/plain"}, version=self.request.version)
+        if headers.get("Sec-WebSocket-Version", "13").strip() != "13":
+            return Response(b"Unsupported WebSocket version", status_code=HTTPStatusCode.UPGRADE_REQUIRED,
+                            headers={"Content-Type": "text/plain", "Sec-WebSocket-Version": "13"},
+                            version=self.request.version)
+        response_headers = {
+            "Upgrade": "websocket",
+            "Connection": "Upgrade",
+            "Sec-WebSocket-Accept": self.accept_key(key),
+        }
+        if subprotocols:
+            offered = [p.strip() for p in headers.get("Sec-WebSocket-Protocol", "").split(",") if p.strip()]
+            for p in offered:
+                if p in subprotocols:
+                    self.subprotocol = p
+                    response_headers["Sec-WebSocket-Protocol"] = p
+                    break
+        return Response(b"", status_code=HTTPStatusCode.SWITCHING_PROTOCOLS, headers=response_headers,
+                        version=self.request.version)
+
+    def accept(self, subprotocols=None) -> bool:
+        """Sends the handshake response. Returns False (after sending an error response) if the upgrade was refused."""
+        response = self.handshake_response(subprotocols)
+        self.socket.sendall(bytes(response))
+        self.accepted = response.status_code == HTTPStatusCode.SWITCHING_PROTOCOLS
+        return self.accepted
+
+    def _recv_into_buffer(self, timeout: float = None):
+        poll_interval = self.default_poll_interval
+        waited = 0
+        while True:
+            wait = poll_interval if timeout is None else min(poll_interval, timeout - waited)
+            self.socket.settimeout(max(wait, 0.001))
+            try:
+                chunk = self.socket.recv(self.default_chunk_size)
+            except socket.timeout:
+                waited += wait
+                if self.cleanup_event is not None and self.cleanup_event.is_set():
+                    self._abort(CloseCode.GOING_AWAY, "server shutting down")
+                if timeout is not None and waited >= timeout:
+                    raise TimeoutError("Timed out waiting for a websocket frame.")
+                continue
+            if not chunk:
+                self._abort(CloseCode.NO_STATUS, "connection lost", send=False)
+            self._buffer += chunk
+            return
+
+    def _read_frame(self, timeout: float = None) -> tuple:
+        while True:
+            try:
+                frame = decode_frame(self._buffer)
+            except ProtocolError as e:
+                self._abort(e.code, str(e))
+            if frame is not None:
+                fin, opcode, payload, masked, n = frame
+                del self._buffer[:n]
+                if masked == self.is_client:
+                    self._abort(CloseCode.PROTOCOL_ERROR, "client frames must be masked, server frames must not be")
+                return fin, opcode, payload
+            if len(self._buffer) > self.max_message_size + 14:
+                self._abort(CloseCode.MESSAGE_TOO_BIG, "message too big")
+            self._recv_into_buffer(timeout)
+
+    def receive(self, timeout: float = None):
+        """Returns the next message (str for text, bytes for binary), or None once the connection has closed."""
+        if self.closed:
+            return None
+        fragments = []
+        size = 0
+        message_opcode = None
+        try:
+            while True:
+                fin, opcode, payload = self._read_frame(timeout)
+                if opcode in Opcode.CONTROL:
+                    if not fin or len(payload) > 125:
+                        self._abort(CloseCode.PROTOCOL_ERROR, "invalid control frame")
+                    if opcode == Opcode.PING:
+                        self._send_frame(Opcode.PONG, payload)
+                    elif opcode == Opcode.CLOSE:
+                        self._on_close_frame(payload)
+                        return None
+                    continue
+                if opcode not in Opcode.DATA:
+                    self._abort(CloseCode.PROTOCOL_ERROR, f"unknown opcode {opcode}")
+                if opcode == Opcode.CONTINUATION:
+                    if message_opcode is None:
+                        self._abort(CloseCode.PROTOCOL_ERROR, "continuation without a message")
+                elif message_opcode is not None:
+                    self._abort(CloseCode.PROTOCOL_ERROR, "new message started before the last one finished")
+                else:
+                    message_opcode = opcode
+                size += len(payload)
+                if size > self.max_message_size:
+                    self._abort(CloseCode.MESSAGE_TOO_BIG, "message too big")
+                fragments.append(payload)
+                if fin:
+                    break
+        except WebSocketClosed:
+            return None
+        data = b"".join(fragments)
+        if message_opcode == Opcode.TEXT:
+            try:
+                return data.decode("utf-8")
+            except UnicodeDecodeError:
+                self._abort(CloseCode.INVALID_PAYLOAD, "invalid utf-8", raise_=False)
+                return None
+        return data
+
+    def _on_close_frame(self, payload: bytes):
+        code = CloseCode.NO_STATUS
+        reason = ""
+        if len(payload) >= 2:
+            code = int.from_bytes(payload[:2], "big")
+            reason = payload[2:].decode("utf-8", "replace")
+        self.close_code = code
+        self.close_reason = reason
+        if not self.closed:
+            # echo the close frame back to complete the closing handshake
+            try:
+                self._send_frame(Opcode.CLOSE, payload[:2])
+            except OSError:
+                pass
+        self._shutdown()
+
+    def _abort(self, code: int, reason: str = "", send: bool = True, raise_: bool = True):
+        if not self.closed:
+            if send:
+                try:
+                    self._send_frame(Opcode.CLOSE, code.to_bytes(2, "big") + reason.encode()[:123])
+                except OSError:
+                    pass
+            self.close_code = code
+            self.close_reason = reason
+            self._shutdown()
+        if raise_:
+            raise WebSocketClosed(code, reason)
+
+    def _send_frame(self, opcode: int, payload: bytes = b"", fin: bool = True):
+        self.socket.sendall(encode_frame(opcode, payload, fin=fin, mask=self.is_client))
+
+    def send(self, data, fragment_size: int = None):
+        """Sends a text (str) or binary (bytes) message, optionally split into frames of at most `fragment_size` bytes."""
+        if self.closed:
+            raise WebSocketClosed(self.close_code or CloseCode.NO_STATUS, self.close_reason)
+        if isinstance(data, str):
+            opcode = Opcode.TEXT
+            data = data.encode("utf-8")
+        else:
+            opcode = Opcode.BINARY
+            data = bytes(data)
+        if not fragment_size or len(data) <= fragment_size:
+            self._send_frame(opcode, data)
+            return
+        for i in range(0, len(data), fragment_size):
+            chunk = data[i:i + fragment_size]
+            self._send_frame(opcode if i == 0 else Opcode.CONTINUATION, chunk, fin=(i + fragment_size) >= len(data))
+
+    def ping(self, payload: bytes = b""):
+        self._send_frame(Opcode.PING, payload[:125])
+
+    def pong(self, payload: bytes = b""):
+        self._send_frame(Opcode.PONG, payload[:125])
+
+    def close(self, code: int = CloseCode.NORMAL, reason: str = "", timeout: float = 1):
+        """Starts (or finishes) the closing handshake and closes the underlying socket."""
+        if self.closed or not self.accepted:
+            self._shutdown()
+            return
+        try:
+            self._send_frame(Opcode.CLOSE, code.to_bytes(2, "big") + reason.encode()[:123])
+            self.close_code = code
+            self.close_reason = reason
+            # wait briefly for the peer's close frame, discarding any data frames still in flight
+            while not self.closed:
+                fin, opcode, payload = self._read_frame(timeout)
+                if opcode == Opcode.CLOSE:
+                    break
+        except (OSError, WebSocketClosed):
+            pass
+        self._shutdown()
+
+    def _shutdown(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+
+    def __iter__(self):
+        while True:
+            message = self.receive()
+            if message is None:
+                return
+            yield message
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({self.socket}, {'client' if self.is_client else 'server'}{', closed' if self.closed else ''})>"
+
+    @classmethod
+    def connect(cls, url: str, headers: dict = None, subprotocols=None, timeout: float = 5) -> "WebSocket":
+        """Opens a client connection, e.g. `WebSocket.connect("ws://localhost:8080/chat")`. Useful for testing."""
+        if "://" in url:
+            scheme, url = url.split("://", 1)
+            if scheme not in ("ws", "http"):
+                raise ValueError(f"Unsupported scheme: {scheme}")
+        host_port, _, path = url.partition("/")
+        host, _, port = host_port.partition(":")
+        port = int(port) if port else 80
+        s = socket.create_connection((host, port), timeout=timeout)
+        key = b64encode(urandom(16)).decode()
+        request_headers = Headers({
+            "Host": host_port,
+            "Upgrade": "websocket",
+            "Connection": "Upgrade",
+            "Sec-WebSocket-Key": key,
+            "Sec-WebSocket-Version": "13",
+            **(headers or {}),
+        })
+        if subprotocols:
+            request_headers["Sec-WebSocket-Protocol"] = ", ".join(subprotocols)
+        s.sendall(f"GET /{path} HTTP/1.1\r\n{request_headers}\r\n".encode())
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = s.recv(cls.default_chunk_size)
+            if not chunk:
+                s.close()
+                raise ConnectionError("Connection closed during the websocket handshake.")
+            data += chunk
+        head, rest = data.split(b"\r\n\r\n", 1)
+        status_line, _, header_bytes = head.partition(b"\r\n")
+        status = status_line.split(b" ", 2)
+        response_headers = Headers({k.strip(): v.strip() for k, v in
+                                    (line.split(":", 1) for line in header_bytes.decode().splitlines() if ":" in line)})
+        if len(status) < 2 or status[1] != b"101" or response_headers.get("Sec-WebSocket-Accept") != cls.accept_key(key):
+            s.close()
+            raise ConnectionError(f"WebSocket handshake failed: {status_line.decode()}")
+        ws = cls(s, is_client=True, initial_data=rest)
+        ws.subprotocol = response_headers.get("Sec-WebSocket-Protocol", None)
+        return ws
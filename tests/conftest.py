@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from socketwrench.types import Request
+
+CLIENT_ADDRESS = ("127.0.0.1", 54321)
+
+
+def make_request(target: str, method: str = "GET", headers: dict = None, body: bytes = b"") -> Request:
+    """A parsed request, as the connection would hand it to a handler."""
+    head = f"{method} {target} HTTP/1.1\r\nHost: localhost"
+    for k, v in {**(headers or {}), **({"Content-Length": str(len(body))} if body else {})}.items():
+        head += f"\r\n{k}: {v}"
+    return Request.from_components(head.encode(), body, CLIENT_ADDRESS)
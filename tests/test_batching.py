@@ -0,0 +1,33 @@
+import pytest
+
+import conftest  # noqa: F401, puts src on the path
+from socketwrench.handlers import RouteHandler
+from socketwrench.tags import batched
+
+
+def test_zero_argument_handler_is_rejected():
+    with pytest.raises(ValueError, match="at least one parameter"):
+        @batched
+        def tick():
+            return 1
+
+
+def test_method_taking_only_self_is_rejected_when_added():
+    class Server:
+        @batched(max_wait_ms=1)
+        def tick(self):
+            return 1
+
+    with pytest.raises(ValueError, match="at least one parameter"):
+        RouteHandler(Server)
+
+
+def test_batched_handler_gets_one_list_per_parameter():
+    from conftest import make_request
+
+    @batched(max_wait_ms=1)
+    def double(x: int):
+        return [v * 2 for v in x]
+
+    handler = RouteHandler({"double": double})
+    assert bytes(handler(make_request("/double?x=4")).body) == b"8"
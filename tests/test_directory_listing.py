@@ -0,0 +1,38 @@
+import json
+
+import conftest  # noqa: F401, puts src on the path
+from socketwrench.handlers import DirectoryListing
+
+
+def listing(tmp_path, n: int = 30) -> DirectoryListing:
+    for i in range(n):
+        (tmp_path / f"f{i:02d}.txt").write_bytes(b"x" * i)
+    (tmp_path / "sub").mkdir()
+    return DirectoryListing(tmp_path, tmp_path.stat())
+
+
+def test_repeated_page_is_served_from_pages(tmp_path):
+    d = listing(tmp_path)
+    size = d.size()
+    first = d.page("/files", "html", per_page=10)
+    assert len(d._pages) == 1
+    assert d.size() == size + len(first)
+    assert d.page("/files", "html", per_page=10) is first
+    assert d.size() == size + len(first)
+
+
+def test_json_page(tmp_path):
+    d = listing(tmp_path)
+    page = json.loads(d.page("/files", "json", sort="size", descending=True, page=2, per_page=10))
+    assert page["pages"] == 4 and page["total"] == 31
+    assert [e["name"] for e in page["entries"]][:2] == ["f20.txt", "f19.txt"]
+
+
+def test_add_starts_over(tmp_path):
+    d = listing(tmp_path)
+    d.page("/files")
+    (tmp_path / "new.txt").write_bytes(b"new")
+    d.add("new.txt", (tmp_path / "new.txt").stat(), tmp_path.stat())
+    assert d._pages == {}
+    assert b"new.txt" in d.page("/files")
+    assert d.size() == DirectoryListing._entries_size(d.entries) + sum(len(b) for b in d._pages.values())
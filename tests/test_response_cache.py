@@ -0,0 +1,28 @@
+from conftest import make_request
+from socketwrench.handlers import RouteHandler
+from socketwrench.response_cache import ResponseCache, invalidate_cache
+from socketwrench.tags import cached
+
+
+def test_invalidate_cache_clears_a_replaced_cache(monkeypatch):
+    monkeypatch.setattr(RouteHandler, "response_cache", ResponseCache(max_bytes=1024 * 1024))
+    calls = []
+
+    @cached(ttl=60)
+    def items():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    handler = RouteHandler({"items": items})
+    handler(make_request("/items"))
+    handler(make_request("/items"))
+    assert len(calls) == 1
+
+    assert invalidate_cache("/items") == 1
+    handler(make_request("/items"))
+    assert len(calls) == 2
+
+
+def test_invalidate_cache_takes_a_cache():
+    cache = ResponseCache()
+    assert invalidate_cache(cache=cache) == 0
@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+from json import loads
+from typing import Optional
+
+import conftest  # noqa: F401, puts src on the path
+from socketwrench.serializers import compile_serializer
+from socketwrench.types import json_encoder_for
+
+
+@dataclass
+class Price:
+    amount: float
+    currency: str = "EUR"
+
+
+@dataclass
+class Row:
+    id: int
+    price: Price = None
+
+
+@dataclass
+class Node:
+    value: int
+    next: Optional["Node"] = None
+
+
+def test_nested_field_set_to_none():
+    assert compile_serializer(Row)(Row(1)) == {"id": 1, "price": None}
+    assert compile_serializer(Row)(Row(1, Price(2.5))) == {"id": 1, "price": {"amount": 2.5, "currency": "EUR"}}
+
+
+def test_single_and_list_encoders_agree():
+    _, encode = json_encoder_for(Row)
+    _, encode_list = json_encoder_for(list[Row])
+    assert loads(encode(Row(1))) == {"id": 1, "price": None}
+    assert loads(encode_list([Row(1), Row(2, Price(1.0))])) == [
+        {"id": 1, "price": None}, {"id": 2, "price": {"amount": 1.0, "currency": "EUR"}}]
+
+
+def test_self_referencing_dataclass():
+    assert compile_serializer(Node)(Node(1, Node(2))) == {"value": 1, "next": {"value": 2, "next": None}}
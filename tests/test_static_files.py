@@ -0,0 +1,41 @@
+import gzip
+
+from conftest import make_request
+from socketwrench.handlers import StaticFileHandler
+
+BODY = b"console.log('hi');\n" * 200
+
+
+def static_folder(tmp_path):
+    (tmp_path / "app.js").write_bytes(BODY)
+    (tmp_path / "app.js.gz").write_bytes(gzip.compress(BODY))
+    return StaticFileHandler(tmp_path, route="/static")
+
+
+def negotiated(handler):
+    r = handler(make_request("/static/app.js", headers={"Accept-Encoding": "gzip"}))
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.headers["Content-Type"].startswith("application/javascript")
+    assert r.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(bytes(r.body)) == BODY
+
+
+def direct(handler):
+    r = handler(make_request("/static/app.js.gz", headers={"Accept-Encoding": "gzip"}))
+    assert "Content-Encoding" not in r.headers
+    assert r.headers["Content-Type"] == "application/gzip"
+    assert gzip.decompress(bytes(r.body)) == BODY
+
+
+def test_sibling_negotiated_then_direct(tmp_path):
+    handler = static_folder(tmp_path)
+    for _ in range(2):
+        negotiated(handler)
+        direct(handler)
+
+
+def test_sibling_direct_then_negotiated(tmp_path):
+    handler = static_folder(tmp_path)
+    for _ in range(2):
+        direct(handler)
+        negotiated(handler)